@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Clear-sky fraction of each result over the area of interest.
+
+``eo:cloud_cover`` is computed over a whole tile: a scene at 40% may be
+clear over the map extent and one at 2% may have its only cloud right on
+it. For the top results the classification band (SCL / QA_PIXEL) is read
+over the map extent only, into a small buffer (``READ_SIZE`` pixels on the
+long side), so GDAL serves it from a coarse COG overview: a few kilobytes
+per scene. The pixels are classified with the same rules as the cloud
+mask (see cloud_mask.py).
+
+Scenes are read concurrently by a small thread pool; GDAL releases the GIL
+while it waits on the network.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import cloud_mask
+from .vrt_builder import MissingMetadata, band_source, bounds_in
+
+# Long side, in pixels, of the buffer the AOI window is read into.
+READ_SIZE = 64
+
+
+def _aoi_window(source, bbox):
+    """Pixel window ``(xoff, yoff, xsize, ysize)`` of a lon/lat ``bbox`` in
+    ``source``, or None when they do not overlap."""
+    gt = source.geotransform
+    min_x, min_y, max_x, max_y = bounds_in(source.epsg, bbox)
+    x0 = max(0, int(math.floor((min_x - gt[0]) / gt[1])))
+    x1 = min(source.width, int(math.ceil((max_x - gt[0]) / gt[1])))
+    y0 = max(0, int(math.floor((max_y - gt[3]) / gt[5])))
+    y1 = min(source.height, int(math.ceil((min_y - gt[3]) / gt[5])))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def clear_fraction(item, mask, collection, sign, bbox, size=READ_SIZE):
+    """Fraction (0-1) of the valid pixels of ``item`` within the lon/lat
+    ``bbox`` that ``mask`` does not flag; NaN when there are none."""
+    from osgeo import gdal
+    if mask.key not in item.assets:
+        return math.nan
+    href = f"/vsicurl/{sign(item.assets[mask.key].href)}"
+    try:
+        source = band_source(item, mask.key, href, collection)
+    except MissingMetadata:
+        return math.nan
+    window = _aoi_window(source, bbox)
+    if window is None:
+        return math.nan
+    xoff, yoff, xsize, ysize = window
+    scale = max(1.0, max(xsize, ysize) / size)
+    buf_x, buf_y = max(1, int(round(xsize / scale))), max(1, int(round(ysize / scale)))
+
+    ds = gdal.Open(href)
+    if ds is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not open {mask.key}")
+    data = ds.GetRasterBand(1).ReadAsArray(xoff, yoff, xsize, ysize, buf_x, buf_y)
+    if data is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not read {mask.key}")
+    valid = ~cloud_mask.fill(data, mask)
+    total = int(valid.sum())
+    if not total:
+        return math.nan
+    clear = valid & ~cloud_mask.flagged(data, mask)
+    return int(clear.sum()) / total
+
+
+def clear_fractions(items, mask, collection, sign, bbox, workers=8,
+                    progress=None, cancelled=None):
+    """``{index: fraction}`` for ``items``, read ``workers`` at a time.
+
+    Scenes that cannot be read get NaN. ``progress(done, total)`` is called
+    as scenes finish and ``cancelled()`` is polled in between; a cancelled
+    run returns what was computed so far.
+    """
+    fractions = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(clear_fraction, item, mask, collection, sign, bbox): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            try:
+                fractions[futures[future]] = future.result()
+            except Exception:
+                fractions[futures[future]] = math.nan
+            if progress is not None:
+                progress(len(fractions), len(items))
+            if cancelled is not None and cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+    return fractions
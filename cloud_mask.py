@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Cloud and shadow masks from the Sentinel-2 SCL and Landsat QA_PIXEL bands.
+
+``eo:cloud_cover`` describes a whole scene; these masks work per pixel. A
+masked composition is an ordinary band-stack (or index) VRT plus a
+dataset-level ``<MaskBand>``: a derived Byte band whose pixel function, in
+this module, reads the classification band and returns 0 where the pixel is
+flagged and 255 elsewhere. GDAL evaluates it block by block alongside the
+composition bands, so masking costs one extra band read, and QGIS, the
+exporter and the warper all honour it as the layer's validity mask.
+
+Which classes (SCL) or bits (QA_PIXEL) are masked is configurable; the
+collection's fill value is always masked.
+"""
+from collections import namedtuple
+
+from . import indices
+
+# Classification asset of each collection.
+MASK_ASSETS = {
+    "sentinel-2-l2a": "SCL",
+    "landsat-c2-l2":  "qa_pixel",
+}
+
+# SCL: 0 no data, 1 saturated or defective, 2 dark area, 3 cloud shadow,
+# 4 vegetation, 5 bare soil, 6 water, 7 unclassified, 8 cloud (medium
+# probability), 9 cloud (high probability), 10 thin cirrus, 11 snow.
+DEFAULT_SCL_CLASSES = (1, 3, 8, 9, 10)
+SCL_FILL = 0
+
+# QA_PIXEL bits: 0 fill, 1 dilated cloud, 2 cirrus, 3 cloud, 4 cloud shadow,
+# 5 snow, 6 clear, 7 water.
+DEFAULT_QA_BITS = (1, 2, 3, 4)
+QA_FILL_BIT = 0
+
+# ``values`` are SCL classes or QA_PIXEL bit numbers, per ``function``.
+CloudMask = namedtuple("CloudMask", "key function values")
+
+
+def parse_values(text):
+    """Integers from a comma or space separated list; invalid entries are skipped."""
+    values = []
+    for part in str(text).replace(",", " ").split():
+        try:
+            values.append(int(part))
+        except ValueError:
+            continue
+    return tuple(values)
+
+
+def cloud_mask(collection, scl_classes=DEFAULT_SCL_CLASSES, qa_bits=DEFAULT_QA_BITS):
+    """The ``CloudMask`` of ``collection``, or None when it has no
+    classification band."""
+    if collection == "sentinel-2-l2a":
+        values = set(scl_classes) | {SCL_FILL}
+        return CloudMask(MASK_ASSETS[collection], "scl_mask", tuple(sorted(values)))
+    if collection == "landsat-c2-l2":
+        values = {b for b in qa_bits if 0 <= b < 16} | {QA_FILL_BIT}
+        return CloudMask(MASK_ASSETS[collection], "qa_mask", tuple(sorted(values)))
+    return None
+
+
+def pixel_function_name(function):
+    return f"{__name__}.{function}"
+
+
+def enable():
+    """Allow GDAL to call the pixel functions of this module."""
+    indices.enable(__name__)
+
+
+def _flags(data, function, values):
+    import numpy as np
+    if function == "scl_mask":
+        return np.isin(data, values)
+    bits = 0
+    for v in values:
+        bits |= 1 << v
+    return (data.astype(np.uint16) & np.uint16(bits)) != 0
+
+
+def flagged(data, mask):
+    """Boolean array, True where a classification array is masked."""
+    return _flags(data, mask.function, mask.values)
+
+
+def fill(data, mask):
+    """Boolean array, True where a classification array has no data."""
+    fill_value = SCL_FILL if mask.function == "scl_mask" else QA_FILL_BIT
+    return _flags(data, mask.function, (fill_value,))
+
+
+# Pixel functions. ``values`` arrives as a comma-separated string.
+
+def _mask_pixels(in_ar, out_ar, function, kwargs):
+    import numpy as np
+    values = [int(v) for v in kwargs["values"].split(",")]
+    out_ar[:] = np.where(_flags(in_ar[0], function, values), 0, 255)
+
+
+def scl_mask(in_ar, out_ar, xoff, yoff, xsize, ysize,
+             raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+    _mask_pixels(in_ar, out_ar, "scl_mask", kwargs)
+
+
+def qa_mask(in_ar, out_ar, xoff, yoff, xsize, ysize,
+            raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+    _mask_pixels(in_ar, out_ar, "qa_mask", kwargs)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Per-pixel temporal composites of several items over the map extent.
+
+Every item's composition is warped (as a VRT, nothing is copied) onto one
+grid covering the map extent: the CRS shared by most items at their native
+pixel size. The grid is then processed in square chunks. For each chunk and
+band the items are stacked, their nodata masked out, and the median (or a
+percentile) is taken along the time axis, so a pixel that is cloudy or
+missing in some scenes still gets a value from the others.
+
+Chunks are computed in a pool of worker processes, since NumPy's nan
+reductions hold the GIL for most of their run. This module imports neither
+QGIS nor Qt, so the workers can import it on their own. QGIS's
+``sys.executable`` is usually the QGIS binary rather than Python, which is
+why the caller passes the interpreter to spawn; when no working process
+pool can be started the chunks run on threads instead.
+
+Memory stays bounded: each worker holds one chunk's stack at a time, and
+the chunk size shrinks as the number of items grows. The output grid itself
+is checked against ``MAX_OUTPUT_BYTES`` before anything is read, since many
+tiles at native resolution add up to a very large raster.
+"""
+import functools
+import math
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .exporter import BLOCK_SIZE, create_tiled, translate_to_cog, write_blocks
+from .vrt_builder import (
+    bounds_in, build_item_vrt, composition_nodata, majority_epsg, vrt_path,
+)
+
+# Percentile computed by each statistic.
+STATISTICS = {"median": 50, "p10": 10, "p25": 25, "p75": 75, "p90": 90}
+
+# Upper bound on one chunk's stack (items x pixels, as float32) per worker.
+CHUNK_BYTES = 32 * 1024 * 1024
+MIN_CHUNK   = 128
+
+# GDAL block cache of each worker process, in MB.
+WORKER_CACHE_MB = 64
+
+# Seconds allowed for the first worker process to start and import GDAL.
+STARTUP_TIMEOUT = 60
+
+# Largest output raster (width x height x bands x pixel size) accepted.
+MAX_OUTPUT_BYTES = 4 * 1024 ** 3
+
+_local = threading.local()
+
+
+def chunk_size(count):
+    """Side of the square chunks for a stack of ``count`` items."""
+    side = BLOCK_SIZE
+    while side > MIN_CHUNK and count * side * side * 4 > CHUNK_BYTES:
+        side //= 2
+    return side
+
+
+def _chunks(width, height, side):
+    for y in range(0, height, side):
+        for x in range(0, width, side):
+            yield x, y, min(side, width - x), min(side, height - y)
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+# Worker side. These run in the pool's processes (or threads).
+
+def _init_worker(config):
+    from osgeo import gdal
+    for key, value in config.items():
+        gdal.SetConfigOption(key, value)
+
+
+def _ping():
+    """Checks that a worker can import GDAL and NumPy."""
+    import numpy
+    from osgeo import gdal
+    return gdal.VersionInfo(), numpy.__version__
+
+
+def _open(path):
+    """Per-worker dataset handles, kept across the chunks of one run."""
+    from osgeo import gdal
+    datasets = getattr(_local, "datasets", None)
+    if datasets is None:
+        datasets = _local.datasets = {}
+    ds = datasets.get(path)
+    if ds is None:
+        ds = datasets[path] = gdal.Open(path)
+        if ds is None:
+            raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not open {path}")
+    return ds
+
+
+def composite_chunk(paths, window, percentile, nodata):
+    """Percentile over ``paths`` of every band in ``window``; returns
+    ``(window, data)`` with ``data`` band-sequential in the source type."""
+    import numpy as np
+    from osgeo import gdal
+    x, y, w, h = window
+    datasets = [_open(p) for p in paths]
+    stack = np.empty((len(datasets), h, w), dtype=np.float32)
+    result = None
+    for b in range(1, datasets[0].RasterCount + 1):
+        for i, ds in enumerate(datasets):
+            data = ds.GetRasterBand(b).ReadAsArray(x, y, w, h)
+            if data is None:
+                raise RuntimeError(gdal.GetLastErrorMsg() or "Could not read a chunk")
+            stack[i] = data
+        stack[stack == nodata] = np.nan
+        with warnings.catch_warnings():
+            # Pixels without a valid value in any scene come out as NaN.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            if percentile == 50:
+                value = np.nanmedian(stack, axis=0)
+            else:
+                value = np.nanpercentile(stack, percentile, axis=0)
+        value[np.isnan(value)] = nodata
+        if np.issubdtype(data.dtype, np.integer):
+            value = np.rint(value)
+        if result is None:
+            result = np.empty((datasets[0].RasterCount, h, w), dtype=data.dtype)
+        result[b - 1] = value
+    return window, result.tobytes()
+
+
+# Caller side.
+
+class TemporalComposite:
+    """Composites ``items`` over the lon/lat ``bbox`` into ``dst_path`` (a COG).
+
+    ``statistic`` is a key of ``STATISTICS``; with a ``CloudMask`` in
+    ``mask`` cloudy pixels are left out of it. ``python`` is the interpreter
+    the worker processes are spawned with and ``config`` the GDAL options
+    they need (network profile and the like). ``progress(done, total)`` is
+    called after every chunk and ``cancelled()`` is polled between chunks.
+    """
+
+    def __init__(self, items, bands, collection, sign, bbox, dst_path,
+                 statistic="median", workers=0, python=None, config=None, mask=None):
+        if statistic not in STATISTICS:
+            raise ValueError(f"Unknown statistic {statistic!r}")
+        self.items      = items
+        self.bands      = bands
+        self.collection = collection
+        self.sign       = sign
+        self.bbox       = bbox
+        self.dst_path   = dst_path
+        self.statistic  = statistic
+        self.workers    = workers or default_workers()
+        self.python     = python
+        self.config     = dict(config or {})
+        self.mask       = mask
+        # "processes" or "threads", once the pool has started.
+        self.parallelism = None
+
+    @property
+    def tiled_path(self):
+        return self.dst_path + ".partial.tif"
+
+    def _target_srs(self):
+        """CRS shared by most items, as an ``osr.SpatialReference``."""
+        from osgeo import osr
+        target = majority_epsg(self.items)
+        if target is None:
+            return None
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(target)
+        return srs
+
+    def _grid(self, sources):
+        """``(wkt, geotransform, width, height)`` of the output grid."""
+        from osgeo import gdal, osr
+        srs = self._target_srs()
+        resolutions = []
+        for path in sources:
+            ds = gdal.Open(path)
+            if ds is None:
+                raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not open {path}")
+            ds_srs = osr.SpatialReference(wkt=ds.GetProjection())
+            if srs is None:
+                srs = ds_srs
+            if ds_srs.IsSame(srs):
+                resolutions.append(abs(ds.GetGeoTransform()[1]))
+            ds = None
+        if not resolutions:
+            raise ValueError("The images lack the projection metadata needed to composite")
+        res = min(resolutions)
+        min_x, min_y, max_x, max_y = bounds_in(srs, self.bbox)
+        # Snap the extent to the pixel grid so the native pixels are kept.
+        min_x, min_y = math.floor(min_x / res) * res, math.floor(min_y / res) * res
+        max_x, max_y = math.ceil(max_x / res) * res, math.ceil(max_y / res) * res
+        width, height = int(round((max_x - min_x) / res)), int(round((max_y - min_y) / res))
+        if width <= 0 or height <= 0:
+            raise ValueError("The map extent is empty")
+        return srs.ExportToWkt(), (min_x, res, 0.0, max_y, 0.0, -res), width, height
+
+    def _warp(self, item, path, grid, nodata):
+        """Warped VRT of one item's composition on the output grid."""
+        from osgeo import gdal
+        wkt, gt, width, height = grid
+        bounds = (gt[0], gt[3] + height * gt[5], gt[0] + width * gt[1], gt[3])
+        warped = vrt_path(f"{item.id}_composite", wkt, *bounds, width, height, *self.bands,
+                          *([self.mask] if self.mask else []))
+        # The warper honours the cloud mask only without an explicit source
+        # nodata; the mask covers the nodata pixels as well.
+        ds = gdal.Warp(
+            warped, path, format="VRT", dstSRS=wkt, outputBounds=bounds,
+            width=width, height=height, srcNodata="None" if self.mask else nodata,
+            dstNodata=nodata, resampleAlg="near")
+        if ds is None:
+            raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not reproject {item.id}")
+        ds = None
+        return warped
+
+    def _pool(self):
+        """A started process pool or, failing that, a thread pool."""
+        import multiprocessing
+        from osgeo import gdal
+        config = dict(self.config)
+        config["GDAL_CACHEMAX"] = str(WORKER_CACHE_MB)
+        trusted = gdal.GetConfigOption("GDAL_VRT_PYTHON_TRUSTED_MODULES")
+        if trusted:
+            # Index compositions call the pixel functions in indices.py.
+            config["GDAL_VRT_PYTHON_TRUSTED_MODULES"] = trusted
+        if self.python and os.path.exists(self.python):
+            pool = None
+            try:
+                context = multiprocessing.get_context("spawn")
+                context.set_executable(self.python)
+                pool = ProcessPoolExecutor(
+                    self.workers, mp_context=context,
+                    initializer=_init_worker, initargs=(config,))
+                pool.submit(_ping).result(timeout=STARTUP_TIMEOUT)
+                self.parallelism = "processes"
+                return pool
+            except Exception:
+                if pool is not None:
+                    pool.shutdown(wait=False)
+        self.parallelism = "threads"
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def _check_size(self, sample, grid):
+        """Refuse output grids above ``MAX_OUTPUT_BYTES``."""
+        from osgeo import gdal
+        _, _, width, height = grid
+        src = gdal.Open(sample)
+        pixel = gdal.GetDataTypeSize(src.GetRasterBand(1).DataType) // 8
+        size = width * height * src.RasterCount * pixel
+        if size > MAX_OUTPUT_BYTES:
+            raise ValueError(
+                f"The composite would be {width} x {height} pixels x {src.RasterCount} "
+                f"bands ({size / 1024 ** 3:.1f} GB); zoom in to a smaller extent")
+
+    def _create_output(self, sample, grid, nodata):
+        from osgeo import gdal
+        wkt, gt, width, height = grid
+        src = gdal.Open(sample)
+        bands = [src.GetRasterBand(idx) for idx in range(1, src.RasterCount + 1)]
+        data_type = bands[0].DataType
+        dst = create_tiled(
+            self.tiled_path, width, height, gt, wkt, data_type,
+            [nodata] * len(bands), [band.GetDescription() for band in bands])
+        return dst, data_type
+
+    def run(self, progress=None, cancelled=None):
+        """Build the composite; returns its path, or None when cancelled."""
+        if not self.items:
+            raise ValueError("No images to composite")
+        nodata = composition_nodata(self.bands)
+        sources = []
+        for item in self.items:
+            if cancelled is not None and cancelled():
+                return None
+            sources.append(build_item_vrt(
+                item, self.bands, self.collection, self.sign, mask=self.mask))
+        grid = self._grid(sources)
+        self._check_size(sources[0], grid)
+        paths = [self._warp(item, path, grid, nodata) for item, path in zip(self.items, sources)]
+
+        _, _, width, height = grid
+        chunks = list(_chunks(width, height, chunk_size(len(paths))))
+        read = functools.partial(
+            composite_chunk, paths, percentile=STATISTICS[self.statistic], nodata=nodata)
+        dst, data_type = self._create_output(paths[0], grid, nodata)
+        done = 0
+
+        def written(chunk):
+            nonlocal done
+            done += 1
+            if progress is not None:
+                progress(done, len(chunks))
+
+        try:
+            with self._pool() as pool:
+                write_blocks(pool, read, chunks, dst, self.workers * 2, written, cancelled)
+        finally:
+            dst.FlushCache()
+            dst = None
+            if done < len(chunks) and os.path.exists(self.tiled_path):
+                os.remove(self.tiled_path)
+        if done < len(chunks):
+            return None
+
+        translate_to_cog(self.tiled_path, self.dst_path, data_type)
+        return self.dst_path
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""How much of the area of interest each result actually covers.
+
+Cloud cover alone happily ranks a tile that only grazes the map extent, or
+a sliver at the edge of a swath, above a clean full view. Each item's
+footprint is intersected with the AOI (the search bbox) in one vectorized
+shapely pass: an STRtree picks the footprints that touch the AOI at all and
+only those are intersected. Areas are compared in lon/lat, which is fine
+for a ratio over an extent the size of a map view.
+"""
+import math
+
+
+def footprint(item):
+    """Shapely geometry of an item's footprint, falling back to its bbox."""
+    from shapely.geometry import box, shape
+    if item.geometry:
+        try:
+            return shape(item.geometry)
+        except (ValueError, TypeError, AttributeError):
+            pass
+    if item.bbox:
+        return box(item.bbox[0], item.bbox[1], item.bbox[-2], item.bbox[-1])
+    return None
+
+
+def coverage_fractions(footprints, bbox):
+    """Fraction (0-1) of the lon/lat ``bbox`` covered by each footprint."""
+    import shapely
+    from shapely.geometry import box
+    aoi = box(*bbox)
+    if not footprints or aoi.area == 0:
+        return [0.0] * len(footprints)
+    if not hasattr(shapely, "STRtree") or not hasattr(shapely, "intersection"):
+        return _coverage_fractions_legacy(footprints, aoi)
+
+    import numpy as np
+    valid = np.array([g is not None for g in footprints])
+    geoms = np.empty(len(footprints), dtype=object)
+    geoms[:] = footprints
+    fractions = np.zeros(len(footprints))
+    if not valid.any():
+        return fractions.tolist()
+    candidates = np.flatnonzero(valid)
+    tree = shapely.STRtree(geoms[candidates])
+    hits = candidates[tree.query(aoi, predicate="intersects")]
+    if hits.size:
+        fractions[hits] = shapely.area(shapely.intersection(geoms[hits], aoi)) / aoi.area
+    return np.clip(fractions, 0.0, 1.0).tolist()
+
+
+def _coverage_fractions_legacy(footprints, aoi):
+    """Shapely 1.x: one prepared AOI tested against every footprint."""
+    from shapely.prepared import prep
+    prepared = prep(aoi)
+    fractions = []
+    for geom in footprints:
+        if geom is None or not prepared.intersects(geom):
+            fractions.append(0.0)
+        else:
+            fractions.append(min(1.0, geom.intersection(aoi).area / aoi.area))
+    return fractions
+
+
+def score(coverage, cloud):
+    """Combined ranking score: AOI coverage times the clear fraction."""
+    if math.isnan(cloud):
+        cloud = 100.0
+    return coverage * (1.0 - min(max(cloud, 0.0), 100.0) / 100.0)
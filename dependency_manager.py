@@ -1,12 +1,14 @@
+import importlib.util
 import sys
 import os
 import subprocess
 from qgis.core import Qgis, QgsMessageLog
 from qgis.PyQt.QtWidgets import (
-    QMessageBox, QProgressDialog, QApplication, QDialog,
+    QMessageBox, QDialog, QPlainTextEdit,
     QVBoxLayout, QLabel, QPushButton, QHBoxLayout
 )
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import QProcess, QProcessEnvironment, QTimer
+from . import plugin_settings
 
 # ── Enum compatibility: Qgis.MessageLevel (QGIS 4/Qt6) vs Qgis.* (QGIS 3/Qt5)
 try:
@@ -29,6 +31,74 @@ try:
 except AttributeError:
     _ACCEPTED = QDialog.Accepted              # PyQt5
 
+# ── QProcess enum compatibility ──────────────────────────────────────────────
+try:
+    _MERGED_CHANNELS = QProcess.ProcessChannelMode.MergedChannels   # PyQt6
+    _NOT_RUNNING     = QProcess.ProcessState.NotRunning
+    _NORMAL_EXIT     = QProcess.ExitStatus.NormalExit
+    _FAILED_TO_START = QProcess.ProcessError.FailedToStart
+except AttributeError:
+    _MERGED_CHANNELS = QProcess.MergedChannels                      # PyQt5
+    _NOT_RUNNING     = QProcess.NotRunning
+    _NORMAL_EXIT     = QProcess.NormalExit
+    _FAILED_TO_START = QProcess.FailedToStart
+
+
+def python_executable():
+    """Locate the Python executable that belongs to the running QGIS install.
+
+    sys.executable in QGIS points to qgis.exe / qgis-bin, NOT python.
+    We search known locations explicitly. Returns None when nothing is found.
+    """
+    if os.name != 'nt':
+        if os.path.basename(sys.executable).lower().startswith('python'):
+            return sys.executable
+        for prefix in (sys.exec_prefix, sys.base_exec_prefix):
+            for name in ('python3', 'python'):
+                candidate = os.path.join(prefix, 'bin', name)
+                if os.path.exists(candidate):
+                    return candidate
+        return sys.executable
+
+    base = os.path.dirname(sys.executable)
+    for name in ('python3.exe', 'python.exe'):
+        candidate = os.path.join(base, name)
+        if os.path.exists(candidate):
+            return candidate
+
+    osgeo_roots = []
+    env_root = os.environ.get('OSGEO4W_ROOT')
+    if env_root:
+        osgeo_roots.append(env_root)
+
+    path = sys.executable
+    for _ in range(4):
+        path = os.path.dirname(path)
+        osgeo_roots.append(path)
+
+    for root in osgeo_roots:
+        for ver in ('Python312', 'Python311', 'Python310', 'Python39', 'Python38'):
+            candidate = os.path.join(root, 'apps', ver, 'python.exe')
+            if os.path.exists(candidate):
+                return candidate
+
+    spec = importlib.util.find_spec('os')
+    if spec and spec.origin:
+        py_dir = os.path.dirname(os.path.dirname(spec.origin))
+        candidate = os.path.join(py_dir, 'python.exe')
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _environment_key():
+    """Identifies the QGIS/Python install that cached paths belong to."""
+    try:
+        qgis_version = Qgis.version()
+    except AttributeError:
+        qgis_version = Qgis.QGIS_VERSION
+    return f"{qgis_version}|{sys.version.split()[0]}|{sys.executable}"
+
 
 class DependencyManager:
     PLUGIN_NAME = "Quick VRT Imagery Loader"
@@ -37,57 +107,41 @@ class DependencyManager:
         self.iface = iface
         self.plugin_name = plugin_name
         self.dependencies = dependencies
-        self._python_exe = self._get_python_executable()
-        # Inject user site-packages into sys.path immediately so that
-        # packages installed in a previous session (or just now) are importable
-        # without restarting QGIS.
-        self._ensure_user_site_on_path()
+        self._python = None
+        self._installer = None
+        # Nothing is probed here: this runs on the QGIS startup path. The
+        # interpreter and user site-packages are looked up on first use and
+        # remembered for this QGIS/Python install (see _cached).
+        if plugin_settings.value("startup/environment") != _environment_key():
+            plugin_settings.set_value("startup/environment", _environment_key())
+            for name in ("python", "user_site"):
+                plugin_settings.set_value(f"startup/{name}", "")
 
     # ── Path helpers ──────────────────────────────────────────────────────────
 
-    def _get_python_executable(self):
-        """Locate the Python executable that belongs to the running QGIS install.
-
-        sys.executable in QGIS points to qgis.exe / qgis-bin, NOT python.
-        We search known locations explicitly.
-        """
-        if os.name != 'nt':
-            return sys.executable
-
-        base = os.path.dirname(sys.executable)
-        for name in ('python3.exe', 'python.exe'):
-            candidate = os.path.join(base, name)
-            if os.path.exists(candidate):
-                return candidate
-
-        osgeo_roots = []
-        env_root = os.environ.get('OSGEO4W_ROOT')
-        if env_root:
-            osgeo_roots.append(env_root)
-
-        path = sys.executable
-        for _ in range(4):
-            path = os.path.dirname(path)
-            osgeo_roots.append(path)
-
-        for root in osgeo_roots:
-            for ver in ('Python312', 'Python311', 'Python310', 'Python39', 'Python38'):
-                candidate = os.path.join(root, 'apps', ver, 'python.exe')
-                if os.path.exists(candidate):
-                    return candidate
-
-        import importlib.util
-        spec = importlib.util.find_spec('os')
-        if spec and spec.origin:
-            py_dir = os.path.dirname(os.path.dirname(spec.origin))
-            candidate = os.path.join(py_dir, 'python.exe')
-            if os.path.exists(candidate):
-                return candidate
+    def _cached(self, name, compute):
+        """``compute()``, remembered in QSettings until QGIS or Python change."""
+        value = plugin_settings.value(f"startup/{name}")
+        if not value:
+            value = compute()
+            if value:
+                plugin_settings.set_value(f"startup/{name}", value)
+        return value
+
+    @property
+    def _python_exe(self):
+        if self._python is None:
+            self._python = self._get_python_executable()
+        return self._python
 
-        QgsMessageLog.logMessage(
-            "Could not locate Python executable. Dependency install may fail.",
-            self.plugin_name, MsgLevel.Warning)
-        return 'python.exe'
+    def _get_python_executable(self):
+        python = self._cached("python", python_executable)
+        if not python:
+            QgsMessageLog.logMessage(
+                "Could not locate Python executable. Dependency install may fail.",
+                self.plugin_name, MsgLevel.Warning)
+            return 'python.exe'
+        return python
 
     def _get_user_site_packages(self):
         """Return the user site-packages directory for the current Python.
@@ -125,7 +179,7 @@ class DependencyManager:
         every previously-installed (or just-installed) package importable
         immediately, without restarting QGIS.
         """
-        user_site = self._get_user_site_packages()
+        user_site = self._cached("user_site", self._get_user_site_packages)
         if user_site and user_site not in sys.path:
             sys.path.insert(0, user_site)
             QgsMessageLog.logMessage(
@@ -135,111 +189,109 @@ class DependencyManager:
     # ── Dependency checks ─────────────────────────────────────────────────────
 
     def check_missing(self):
-        """Return the pip names of packages that cannot be imported right now."""
+        """Return the pip names of packages that cannot be found right now.
+
+        Packages are only looked up, not imported, so the check stays cheap
+        on the QGIS startup path; the plugin imports them when its dialog is
+        first opened.
+        """
+        # Packages installed with --user in a previous session (or just now)
+        # become importable without restarting QGIS.
+        self._ensure_user_site_on_path()
         missing = []
         for pip_name, import_name in self.dependencies.items():
             try:
-                __import__(import_name)
-            except ImportError:
+                found = importlib.util.find_spec(import_name) is not None
+            except (ImportError, ValueError):
+                found = False
+            if not found:
                 missing.append(pip_name)
         return missing
 
-    def check_and_install(self):
+    def check_and_install(self, on_ready=None):
         """Check for missing dependencies and offer to install them.
 
-        Returns True if all dependencies are satisfied (either were already
-        present, or were just installed successfully).
+        Returns True if all dependencies are already present. Otherwise the
+        installation, if the user accepts it, runs in the background and
+        ``on_ready()`` is called once the packages are importable.
         """
         missing = self.check_missing()
         if not missing:
             return True
 
+        if self._installer is not None:
+            # An installation is already running; show it again.
+            self._installer.show()
+            self._installer.raise_()
+            return False
+
         dialog = DependencyInstallDialog(
             self.iface.mainWindow(), missing, self.plugin_name)
         if dialog.exec() != _ACCEPTED:
             return False
 
-        success = self._install_packages(missing)
-
-        if success:
-            # Re-inject user site-packages so the freshly installed packages
-            # are importable in this same QGIS session.
-            self._ensure_user_site_on_path()
-
-            # Verify that the packages are now actually importable.
-            still_missing = self.check_missing()
-            if still_missing:
-                QgsMessageLog.logMessage(
-                    f"Packages installed but still not importable: {still_missing}. "
-                    "A QGIS restart may be required.",
-                    self.plugin_name, MsgLevel.Warning)
-                QMessageBox.warning(
-                    self.iface.mainWindow(),
-                    "Restart required",
-                    "The packages were installed but could not be loaded into the "
-                    "current session.\n\nPlease restart QGIS and open the plugin again."
-                )
-                return False
-
-        return success
+        self._installer = InstallProgressDialog(
+            self.iface.mainWindow(), self.plugin_name, self._python_exe,
+            self._pip_arguments(missing),
+            lambda ok, cancelled, output: self._on_install_finished(
+                missing, on_ready, ok, cancelled, output))
+        self._installer.start()
+        return False
 
     # ── Installation ──────────────────────────────────────────────────────────
 
-    def _install_packages(self, packages):
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        progress = QProgressDialog(
-            "Installing dependencies…", "Cancel", 0, len(packages),
-            self.iface.mainWindow())
-        progress.setWindowModality(Qt.WindowModality.WindowModal \
-            if hasattr(Qt.WindowModality, 'WindowModal') \
-            else Qt.WindowModal)
-        progress.setAutoClose(True)
-        progress.show()
-
-        for i, pkg in enumerate(packages):
-            if progress.wasCanceled():
-                break
-
-            progress.setLabelText(f"Downloading and installing {pkg}…")
-            progress.setValue(i)
-            QApplication.processEvents()
+    @property
+    def installing(self):
+        return self._installer is not None
+
+    def _pip_arguments(self, packages):
+        """One ``pip install`` for every package, so they resolve together."""
+        args = ["-m", "pip", "install", "--user", "--progress-bar", "off",
+                "--disable-pip-version-check"]
+        wheelhouse = plugin_settings.value("install/wheelhouse")
+        if wheelhouse and os.path.isdir(wheelhouse):
+            # Pre-built wheels (e.g. copied to a field laptop); offline
+            # installs take them from there only.
+            args += ["--find-links", wheelhouse]
+            if plugin_settings.value("install/offline"):
+                args.append("--no-index")
+        return args + list(packages)
+
+    def _on_install_finished(self, packages, on_ready, ok, cancelled, output):
+        self._installer = None
+        if cancelled:
+            QgsMessageLog.logMessage(
+                "Dependency installation cancelled.", self.plugin_name, MsgLevel.Info)
+            return
+        if not ok:
+            QgsMessageLog.logMessage(
+                f"Error installing {', '.join(packages)}: {output}",
+                self.plugin_name, MsgLevel.Critical)
+            QMessageBox.critical(
+                self.iface.mainWindow(),
+                "Install error",
+                f"Failed to install {', '.join(packages)}:\n\n{output[-300:]}"
+            )
+            return
 
-            try:
-                subprocess.run(
-                    [self._python_exe, "-m", "pip", "install", "--user", pkg],
-                    startupinfo=startupinfo,
-                    capture_output=True,
-                    check=True,
-                    text=True
-                )
-            except subprocess.CalledProcessError as e:
-                progress.close()
-                err = e.stderr or str(e)
-                QgsMessageLog.logMessage(
-                    f"Error installing {pkg}: {err}",
-                    self.plugin_name, MsgLevel.Critical)
-                QMessageBox.critical(
-                    self.iface.mainWindow(),
-                    "Install error",
-                    f"Failed to install '{pkg}':\n\n{err[:300]}"
-                )
-                return False
-            except Exception as e:
-                progress.close()
-                QgsMessageLog.logMessage(
-                    f"Unexpected error installing {pkg}: {e}",
-                    self.plugin_name, MsgLevel.Critical)
-                QMessageBox.critical(
-                    self.iface.mainWindow(), "Install error", str(e))
-                return False
-
-        progress.setValue(len(packages))
-        progress.close()
-        QApplication.processEvents()
+        # The import system caches directory listings; drop them so the
+        # freshly installed packages are found in this same session.
+        importlib.invalidate_caches()
+
+        # Verify that the packages are now actually importable.
+        still_missing = self.check_missing()
+        if still_missing:
+            QgsMessageLog.logMessage(
+                f"Packages installed but still not importable: {still_missing}. "
+                "A QGIS restart may be required.",
+                self.plugin_name, MsgLevel.Warning)
+            QMessageBox.warning(
+                self.iface.mainWindow(),
+                "Restart required",
+                "The packages were installed but could not be loaded into the "
+                "current session.\n\nPlease restart QGIS and open the plugin again."
+            )
+            return
 
         QMessageBox.information(
             self.iface.mainWindow(),
@@ -247,7 +299,8 @@ class DependencyManager:
             "Dependencies installed successfully!\n\n"
             "The plugin is ready to use."
         )
-        return True
+        if on_ready is not None:
+            on_ready()
 
 
 class DependencyInstallDialog(QDialog):
@@ -282,4 +335,95 @@ class DependencyInstallDialog(QDialog):
         btn_layout.addStretch()
         btn_layout.addWidget(btn_cancel)
         btn_layout.addWidget(btn_install)
-        layout.addLayout(btn_layout)
\ No newline at end of file
+        layout.addLayout(btn_layout)
+
+class InstallProgressDialog(QDialog):
+    """Runs pip in a QProcess, streaming its output, without blocking QGIS.
+
+    ``on_finished(ok, cancelled, output)`` is called once the process ends.
+    """
+
+    def __init__(self, parent, plugin_name, python, arguments, on_finished):
+        super().__init__(parent)
+        self.setWindowTitle(f"{plugin_name} – Installing dependencies")
+        self.setMinimumSize(560, 320)
+        self._on_finished = on_finished
+        self._cancelled   = False
+        self._output      = []
+
+        layout = QVBoxLayout(self)
+        self._label = QLabel("Installing dependencies…")
+        layout.addWidget(self._label)
+        self._log = QPlainTextEdit()
+        self._log.setReadOnly(True)
+        layout.addWidget(self._log)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        self._btn_cancel = QPushButton("Cancel")
+        self._btn_cancel.clicked.connect(self.cancel)
+        btn_layout.addWidget(self._btn_cancel)
+        layout.addLayout(btn_layout)
+
+        self._process = QProcess(self)
+        self._process.setProgram(python)
+        self._process.setArguments(arguments)
+        self._process.setProcessChannelMode(_MERGED_CHANNELS)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")
+        self._process.setProcessEnvironment(env)
+        self._process.readyReadStandardOutput.connect(self._read_output)
+        self._process.finished.connect(self._finished)
+        self._process.errorOccurred.connect(self._error)
+
+    def start(self):
+        self._log.appendPlainText(
+            " ".join([self._process.program()] + self._process.arguments()))
+        self.show()
+        self._process.start()
+
+    def cancel(self):
+        if self._process.state() == _NOT_RUNNING:
+            return
+        self._cancelled = True
+        self._label.setText("Cancelling…")
+        self._btn_cancel.setEnabled(False)
+        self._process.terminate()
+        # pip may not stop right away on Windows, where terminate() only
+        # asks nicely.
+        QTimer.singleShot(3000, self._kill)
+
+    def _kill(self):
+        if self._process.state() != _NOT_RUNNING:
+            self._process.kill()
+
+    def reject(self):
+        # Esc and the window's close button cancel a running installation;
+        # the window goes away once pip has stopped.
+        if self._process.state() != _NOT_RUNNING:
+            self.cancel()
+            return
+        super().reject()
+
+    def _read_output(self):
+        text = bytes(self._process.readAllStandardOutput()).decode("utf-8", "replace")
+        self._output.append(text)
+        self._log.appendPlainText(text.rstrip("\n"))
+
+    def _finished(self, exit_code, exit_status):
+        ok = exit_status == _NORMAL_EXIT and exit_code == 0 and not self._cancelled
+        self._done(ok)
+
+    def _error(self, error):
+        # Only a failure to start is reported here; crashes also emit
+        # finished().
+        if error == _FAILED_TO_START:
+            self._output.append(f"Could not start {self._process.program()}: "
+                                f"{self._process.errorString()}")
+            self._done(False)
+
+    def _done(self, ok):
+        if self._on_finished is None:
+            return
+        on_finished, self._on_finished = self._on_finished, None
+        self.close()
+        on_finished(ok, self._cancelled, "".join(self._output).strip())
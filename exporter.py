@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Clip-to-extent export of a remote VRT into a local GeoTIFF/COG.
+
+Only the window covering the requested extent is read. The window is split
+into blocks matching the output tiling. Blocks are fetched concurrently,
+each thread through its own GDAL dataset handle, and written to disk as
+they arrive, so memory stays bounded by the number of blocks in flight.
+
+Progress is recorded in a small JSON sidecar next to the output. An
+interrupted export restarts from the blocks that are still missing, provided
+the sidecar was written for the same source, window and bands; otherwise it
+is discarded and the export starts afresh.
+
+When the source has a dataset mask (a cloud-masked VRT), each block's mask
+is read with it and the masked pixels are written as nodata.
+
+The block pipeline, the tiled output and the COG conversion are shared with
+the temporal composite (composite.py).
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .vrt_builder import bounds_in
+
+BLOCK_SIZE = 512
+SAVE_EVERY = 16
+
+
+def creation_options(data_type, tiled=True):
+    """DEFLATE options with the predictor that suits the pixel type."""
+    from osgeo import gdal
+    floating = data_type in (gdal.GDT_Float32, gdal.GDT_Float64)
+    options = ["COMPRESS=DEFLATE", f"PREDICTOR={3 if floating else 2}", "BIGTIFF=IF_SAFER"]
+    if tiled:
+        options += ["TILED=YES", f"BLOCKXSIZE={BLOCK_SIZE}", f"BLOCKYSIZE={BLOCK_SIZE}"]
+    return options
+
+
+def create_tiled(path, width, height, geotransform, projection, data_type,
+                 nodata, descriptions):
+    """Tiled, compressed GTiff to write blocks into; ``nodata`` and
+    ``descriptions`` hold one entry per band (nodata may be None)."""
+    from osgeo import gdal
+    dst = gdal.GetDriverByName("GTiff").Create(
+        path, width, height, len(descriptions), data_type, creation_options(data_type))
+    dst.SetGeoTransform(list(geotransform))
+    dst.SetProjection(projection)
+    for idx, (value, description) in enumerate(zip(nodata, descriptions), 1):
+        band = dst.GetRasterBand(idx)
+        if value is not None:
+            band.SetNoDataValue(value)
+        band.SetDescription(description)
+    return dst
+
+
+def write_blocks(pool, read, blocks, dst, in_flight, written=None, cancelled=None):
+    """Read ``blocks`` on ``pool``, at most ``in_flight`` at a time, and
+    write each to ``dst`` as it arrives.
+
+    ``read(block)`` returns ``((x, y, w, h), data)``. ``written(block)`` is
+    called after every write and ``cancelled()`` polled in between; returns
+    False when the run was cancelled.
+    """
+    pending = set()
+    queue = iter(blocks)
+
+    def refill():
+        for block in queue:
+            pending.add(pool.submit(read, block))
+            if len(pending) >= in_flight:
+                break
+
+    refill()
+    while pending:
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        pending.difference_update(finished)
+        for future in finished:
+            (x, y, w, h), data = future.result()
+            dst.WriteRaster(x, y, w, h, data)
+            if written is not None:
+                written((x, y, w, h))
+        if cancelled is not None and cancelled():
+            for future in pending:
+                future.cancel()
+            return False
+        refill()
+    return True
+
+
+def translate_to_cog(tiled_path, dst_path, data_type):
+    """Convert the intermediate tiled GTiff into a COG and remove it. The
+    COG driver adds overviews and reorders the tiles; the data itself is
+    already local at this point."""
+    from osgeo import gdal
+    out = gdal.Translate(
+        dst_path, tiled_path, format="COG",
+        creationOptions=creation_options(data_type, tiled=False))
+    if out is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or "COG conversion failed")
+    out = None
+    os.remove(tiled_path)
+
+
+def _window(ds, bounds):
+    """Pixel window ``(xoff, yoff, xsize, ysize)`` of ``bounds`` in ``ds``."""
+    gt = ds.GetGeoTransform()
+    min_x, min_y, max_x, max_y = bounds
+    x0 = int((min_x - gt[0]) / gt[1])
+    x1 = int(round((max_x - gt[0]) / gt[1] + 0.5))
+    y0 = int((max_y - gt[3]) / gt[5])
+    y1 = int(round((min_y - gt[3]) / gt[5] + 0.5))
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(ds.RasterXSize, x1), min(ds.RasterYSize, y1)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError("The map extent does not overlap the image")
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _blocks(width, height):
+    for y in range(0, height, BLOCK_SIZE):
+        for x in range(0, width, BLOCK_SIZE):
+            yield x, y, min(BLOCK_SIZE, width - x), min(BLOCK_SIZE, height - y)
+
+
+class WindowExporter:
+    """Copies the extent window of ``src_path`` into ``dst_path``.
+
+    ``bbox`` is in lon/lat. ``progress(done, total)`` is called after every
+    block and ``cancelled()`` is polled between blocks.
+    """
+
+    def __init__(self, src_path, dst_path, bbox, workers=4, cog=True):
+        self.src_path = src_path
+        self.dst_path = dst_path
+        self.bbox     = bbox
+        self.workers  = workers
+        self.cog      = cog
+        self._local   = threading.local()
+        self._nodata  = None
+
+    @property
+    def state_path(self):
+        return self.dst_path + ".partial.json"
+
+    @property
+    def tiled_path(self):
+        # With COG output the blocks first go to an intermediate tiled GTiff.
+        return self.dst_path + ".partial.tif" if self.cog else self.dst_path
+
+    def _src(self):
+        """Per-thread dataset handle: GDAL datasets are not thread-safe."""
+        from osgeo import gdal
+        ds = getattr(self._local, "ds", None)
+        if ds is None:
+            ds = self._local.ds = gdal.Open(self.src_path)
+        return ds
+
+    def _state_key(self, src, window):
+        """What a sidecar must match to be resumed. The VRT file name (a
+        hash of item, bands and mask) stands for the source, since the VRT
+        directory changes between sessions."""
+        return {
+            "src":    os.path.basename(self.src_path),
+            "window": list(window),
+            "bands":  src.RasterCount,
+            "type":   src.GetRasterBand(1).DataType,
+        }
+
+    def _load_state(self, src, window):
+        """Blocks already written by a matching interrupted export."""
+        from osgeo import gdal
+        if not os.path.exists(self.state_path):
+            return set()
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            state = {}
+        key = self._state_key(src, window)
+        if all(state.get(k) == v for k, v in key.items()) and os.path.exists(self.tiled_path):
+            partial = gdal.Open(self.tiled_path)
+            shape = None if partial is None else (
+                partial.RasterXSize, partial.RasterYSize, partial.RasterCount)
+            partial = None
+            if shape == (window[2], window[3], src.RasterCount):
+                return {tuple(b) for b in state.get("done", [])}
+        self._discard_state()
+        return set()
+
+    def _discard_state(self):
+        os.remove(self.state_path)
+        if self.cog and os.path.exists(self.tiled_path):
+            os.remove(self.tiled_path)
+
+    def _save_state(self, src, window, done):
+        tmp = self.state_path + ".tmp"
+        state = self._state_key(src, window)
+        state["done"] = sorted(done)
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, self.state_path)
+
+    def _read_block(self, window, block):
+        x, y, w, h = block
+        ds = self._src()
+        if self._nodata is None:
+            return block, ds.ReadRaster(window[0] + x, window[1] + y, w, h)
+        data = ds.ReadAsArray(window[0] + x, window[1] + y, w, h).reshape(-1, h, w)
+        mask = ds.GetRasterBand(1).GetMaskBand().ReadAsArray(window[0] + x, window[1] + y, w, h)
+        masked = mask == 0
+        for band, value in zip(data, self._nodata):
+            band[masked] = value
+        return block, data.tobytes()
+
+    def _masked_nodata(self, src):
+        """Per-band nodata to write masked pixels as, or None when ``src``
+        has no dataset mask."""
+        from osgeo import gdal
+        if not src.GetRasterBand(1).GetMaskFlags() & gdal.GMF_PER_DATASET:
+            return None
+        return [src.GetRasterBand(idx).GetNoDataValue() or 0
+                for idx in range(1, src.RasterCount + 1)]
+
+    def _create_output(self, src, window):
+        xoff, yoff, width, height = window
+        gt = list(src.GetGeoTransform())
+        gt[0] += xoff * gt[1]
+        gt[3] += yoff * gt[5]
+        bands = [src.GetRasterBand(idx) for idx in range(1, src.RasterCount + 1)]
+        nodata = [band.GetNoDataValue() for band in bands]
+        if self._nodata is not None:
+            nodata = [v if v is not None else m for v, m in zip(nodata, self._nodata)]
+        return create_tiled(
+            self.tiled_path, width, height, gt, src.GetProjection(),
+            bands[0].DataType, nodata, [band.GetDescription() for band in bands])
+
+    def run(self, progress=None, cancelled=None, resumed=None):
+        """Run (or resume) the export; returns the final output path.
+
+        ``resumed()`` is called when an interrupted export is picked up.
+        """
+        from osgeo import gdal, osr
+
+        src = self._src()
+        self._nodata = self._masked_nodata(src)
+        bounds = bounds_in(osr.SpatialReference(wkt=src.GetProjection()), self.bbox)
+        window = _window(src, bounds)
+
+        done = self._load_state(src, window)
+        if done:
+            if resumed is not None:
+                resumed()
+            dst = gdal.Open(self.tiled_path, gdal.GA_Update)
+        else:
+            dst = self._create_output(src, window)
+        blocks = [b for b in _blocks(window[2], window[3]) if b not in done]
+        total = len(done) + len(blocks)
+
+        unsaved = 0
+
+        def written(block):
+            nonlocal unsaved
+            done.add(block)
+            unsaved += 1
+            if unsaved >= SAVE_EVERY:
+                dst.FlushCache()
+                self._save_state(src, window, done)
+                unsaved = 0
+            if progress is not None:
+                progress(len(done), total)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            finished = write_blocks(
+                pool, lambda block: self._read_block(window, block), blocks, dst,
+                self.workers * 2, written, cancelled)
+        dst.FlushCache()
+        if not finished:
+            self._save_state(src, window, done)
+            return None
+        dst = None
+
+        if self.cog:
+            translate_to_cog(self.tiled_path, self.dst_path, src.GetRasterBand(1).DataType)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.dst_path
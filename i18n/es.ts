@@ -123,8 +123,8 @@
 <translation>0 = Imagen más limpia, 1 = Segunda mejor, etc.</translation>
 </message>
 <message>
-<source>Sorted by cloud cover, lowest to highest. Click a row to preview.</source>
-<translation>Ordenado por cobertura de nubes (menor a mayor). Haga clic en una fila para ver la previa.</translation>
+<source>Ranked by score (map coverage × clear sky). Click a row to preview.</source>
+<translation>Ordenado por puntuación (cobertura del mapa × cielo despejado). Haga clic en una fila para previsualizar.</translation>
 </message>
 <message>
 <source>Load image</source>
@@ -138,5 +138,277 @@
 <source>Load error</source>
 <translation>Error al cargar</translation>
 </message>
+<message>
+<source>Coverage (%)</source>
+<translation>Cobertura (%)</translation>
+</message>
+<message>
+<source>Score</source>
+<translation>Puntuación</translation>
+</message>
+<message>
+<source>Max results:</source>
+<translation>Resultados máx:</translation>
+</message>
+<message>
+<source>Maximum number of images returned by a search</source>
+<translation>Número máximo de imágenes devueltas por una búsqueda</translation>
+</message>
+<message>
+<source>Unlimited</source>
+<translation>Ilimitado</translation>
+</message>
+<message>
+<source>Network:</source>
+<translation>Red:</translation>
+</message>
+<message>
+<source>Conservative</source>
+<translation>Conservador</translation>
+</message>
+<message>
+<source>Aggressive</source>
+<translation>Agresivo</translation>
+</message>
+<message>
+<source>Custom</source>
+<translation>Personalizado</translation>
+</message>
+<message>
+<source>GDAL network settings applied to the loaded layers</source>
+<translation>Configuración de red de GDAL aplicada a las capas cargadas</translation>
+</message>
+<message>
+<source>Edit…</source>
+<translation>Editar…</translation>
+</message>
+<message>
+<source>Edit the custom network profile</source>
+<translation>Editar el perfil de red personalizado</translation>
+</message>
+<message>
+<source>Custom network profile</source>
+<translation>Perfil de red personalizado</translation>
+</message>
+<message>
+<source>GDAL configuration options, one KEY=VALUE per line:</source>
+<translation>Opciones de configuración de GDAL, una CLAVE=VALOR por línea:</translation>
+</message>
+<message>
+<source>Batch:</source>
+<translation>Lote:</translation>
+</message>
+<message>
+<source>Number of images, from the top of the list, loaded by &quot;Load top N&quot;</source>
+<translation>Número de imágenes, desde el principio de la lista, cargadas por &quot;Cargar top N&quot;</translation>
+</message>
+<message>
+<source>Load top N</source>
+<translation>Cargar top N</translation>
+</message>
+<message>
+<source>Load selected</source>
+<translation>Cargar seleccionadas</translation>
+</message>
+<message>
+<source>Load every selected row (Ctrl/Shift+click to select several)</source>
+<translation>Cargar todas las filas seleccionadas (Ctrl/Mayús+clic para seleccionar varias)</translation>
+</message>
+<message>
+<source>Loading images</source>
+<translation>Cargando imágenes</translation>
+</message>
+<message>
+<source>Batch loading cancelled.</source>
+<translation>Carga por lotes cancelada.</translation>
+</message>
+<message>
+<source>{} of {} images could not be loaded, see the log for details.</source>
+<translation>No se pudieron cargar {} de {} imágenes, consulte el registro para más detalles.</translation>
+</message>
+<message>
+<source>Load mosaic</source>
+<translation>Cargar mosaico</translation>
+</message>
+<message>
+<source>One layer with the least cloudy image of every tile in the map extent, from the selected row&apos;s acquisition if a row is selected</source>
+<translation>Una capa con la imagen menos nubosa de cada tesela en la extensión del mapa, de la adquisición de la fila seleccionada si hay una</translation>
+</message>
+<message>
+<source>Export map extent…</source>
+<translation>Exportar extensión del mapa…</translation>
+</message>
+<message>
+<source>Save the chosen image, clipped to the map extent, as a local Cloud Optimized GeoTIFF</source>
+<translation>Guardar la imagen elegida, recortada a la extensión del mapa, como un Cloud Optimized GeoTIFF local</translation>
+</message>
+<message>
+<source>Export map extent</source>
+<translation>Exportar extensión del mapa</translation>
+</message>
+<message>
+<source>GeoTIFF (*.tif *.tiff)</source>
+<translation>GeoTIFF (*.tif *.tiff)</translation>
+</message>
+<message>
+<source>Exporting</source>
+<translation>Exportando</translation>
+</message>
+<message>
+<source>Cancel</source>
+<translation>Cancelar</translation>
+</message>
+<message>
+<source>Export</source>
+<translation>Exportar</translation>
+</message>
+<message>
+<source>Export error</source>
+<translation>Error de exportación</translation>
+</message>
+<message>
+<source>Export cancelled. Export to the same file again to resume.</source>
+<translation>Exportación cancelada. Exporte al mismo archivo de nuevo para reanudar.</translation>
+</message>
+<message>
+<source>Resuming an interrupted export.</source>
+<translation>Reanudando una exportación interrumpida.</translation>
+</message>
+<message>
+<source>Resolution:</source>
+<translation>Resolución:</translation>
+</message>
+<message>
+<source>Match map scale</source>
+<translation>Escala del mapa</translation>
+</message>
+<message>
+<source>Full resolution</source>
+<translation>Resolución completa</translation>
+</message>
+<message>
+<source>Overview 1 (1/2)</source>
+<translation>Vista general 1 (1/2)</translation>
+</message>
+<message>
+<source>Overview 2 (1/4)</source>
+<translation>Vista general 2 (1/4)</translation>
+</message>
+<message>
+<source>Overview 3 (1/8)</source>
+<translation>Vista general 3 (1/8)</translation>
+</message>
+<message>
+<source>Overview 4 (1/16)</source>
+<translation>Vista general 4 (1/16)</translation>
+</message>
+<message>
+<source>Reduced resolutions read the images&apos; overviews: much faster for regional views</source>
+<translation>Las resoluciones reducidas leen las vistas generales de las imágenes: mucho más rápido para vistas regionales</translation>
+</message>
+<message>
+<source>Rebuild the active layer, loaded at reduced resolution, at full resolution</source>
+<translation>Reconstruir la capa activa, cargada a resolución reducida, a resolución completa</translation>
+</message>
+<message>
+<source>Select a layer that was loaded at reduced resolution.</source>
+<translation>Seleccione una capa cargada a resolución reducida.</translation>
+</message>
+<message>
+<source>Show duplicates</source>
+<translation>Mostrar duplicados</translation>
+</message>
+<message>
+<source>Also list older or cloudier copies of the same acquisition (same platform, tile and time), e.g. reprocessed items</source>
+<translation>Listar también copias más antiguas o más nubosas de la misma adquisición (misma plataforma, tesela y hora), p. ej. ítems reprocesados</translation>
+</message>
+<message>
+<source>{} duplicate images hidden</source>
+<translation>{} imágenes duplicadas ocultas</translation>
+</message>
+<message>
+<source>Temporal composite…</source>
+<translation>Compuesto temporal…</translation>
+</message>
+<message>
+<source>Per-pixel median (or percentile) of the selected images, or of the top N, over the map extent, saved as a local Cloud Optimized GeoTIFF</source>
+<translation>Mediana (o percentil) por píxel de las imágenes seleccionadas, o de las top N, en la extensión del mapa, guardada como un Cloud Optimized GeoTIFF local</translation>
+</message>
+<message>
+<source>Temporal composite</source>
+<translation>Compuesto temporal</translation>
+</message>
+<message>
+<source>Composite</source>
+<translation>Compuesto</translation>
+</message>
+<message>
+<source>A composite needs at least two images.</source>
+<translation>Un compuesto necesita al menos dos imágenes.</translation>
+</message>
+<message>
+<source>Per-pixel statistic of {} images:</source>
+<translation>Estadística por píxel de {} imágenes:</translation>
+</message>
+<message>
+<source>Median</source>
+<translation>Mediana</translation>
+</message>
+<message>
+<source>10th percentile</source>
+<translation>Percentil 10</translation>
+</message>
+<message>
+<source>25th percentile</source>
+<translation>Percentil 25</translation>
+</message>
+<message>
+<source>75th percentile</source>
+<translation>Percentil 75</translation>
+</message>
+<message>
+<source>90th percentile</source>
+<translation>Percentil 90</translation>
+</message>
+<message>
+<source>Compositing</source>
+<translation>Componiendo</translation>
+</message>
+<message>
+<source>Composite cancelled.</source>
+<translation>Compuesto cancelado.</translation>
+</message>
+<message>
+<source>Mask clouds and shadows</source>
+<translation>Enmascarar nubes y sombras</translation>
+</message>
+<message>
+<source>Hide cloud, cirrus and shadow pixels using the Sentinel-2 scene classification (SCL) or Landsat QA_PIXEL band</source>
+<translation>Ocultar píxeles de nube, cirros y sombra usando la clasificación de escena de Sentinel-2 (SCL) o la banda QA_PIXEL de Landsat</translation>
+</message>
+<message>
+<source>AOI clear (%)</source>
+<translation>Despejado en AOI (%)</translation>
+</message>
+<message>
+<source>Rank by clear sky</source>
+<translation>Ordenar por cielo despejado</translation>
+</message>
+<message>
+<source>Measure how clear the map extent is in the top results, from a low-resolution read of their SCL / QA_PIXEL band, and rank by it</source>
+<translation>Medir qué tan despejada está la extensión del mapa en los primeros resultados, con una lectura a baja resolución de la banda SCL / QA_PIXEL, y ordenar por ello</translation>
+</message>
+<message>
+<source>Measuring clear sky over the map extent…</source>
+<translation>Midiendo cielo despejado en la extensión del mapa…</translation>
+</message>
+<message>
+<source>Clear sky measured over the map extent for {} images</source>
+<translation>Cielo despejado medido en la extensión del mapa para {} imágenes</translation>
+</message>
+<message>
+<source>Clear sky error</source>
+<translation>Error al medir cielo despejado</translation>
+</message>
 </context>
 </TS>
@@ -123,8 +123,8 @@
 <translation>0 = Imagem mais limpa, 1 = Segunda melhor, etc.</translation>
 </message>
 <message>
-<source>Sorted by cloud cover, lowest to highest. Click a row to preview.</source>
-<translation>Ordenado por cobertura de nuvens (menor para maior). Clique em uma linha para pré-visualizar.</translation>
+<source>Ranked by score (map coverage × clear sky). Click a row to preview.</source>
+<translation>Ordenado por pontuação (cobertura do mapa × céu limpo). Clique em uma linha para pré-visualizar.</translation>
 </message>
 <message>
 <source>Load image</source>
@@ -138,5 +138,277 @@
 <source>Load error</source>
 <translation>Erro ao carregar</translation>
 </message>
+<message>
+<source>Coverage (%)</source>
+<translation>Cobertura (%)</translation>
+</message>
+<message>
+<source>Score</source>
+<translation>Pontuação</translation>
+</message>
+<message>
+<source>Max results:</source>
+<translation>Resultados máx:</translation>
+</message>
+<message>
+<source>Maximum number of images returned by a search</source>
+<translation>Número máximo de imagens retornadas por uma busca</translation>
+</message>
+<message>
+<source>Unlimited</source>
+<translation>Ilimitado</translation>
+</message>
+<message>
+<source>Network:</source>
+<translation>Rede:</translation>
+</message>
+<message>
+<source>Conservative</source>
+<translation>Conservador</translation>
+</message>
+<message>
+<source>Aggressive</source>
+<translation>Agressivo</translation>
+</message>
+<message>
+<source>Custom</source>
+<translation>Personalizado</translation>
+</message>
+<message>
+<source>GDAL network settings applied to the loaded layers</source>
+<translation>Configurações de rede do GDAL aplicadas às camadas carregadas</translation>
+</message>
+<message>
+<source>Edit…</source>
+<translation>Editar…</translation>
+</message>
+<message>
+<source>Edit the custom network profile</source>
+<translation>Editar o perfil de rede personalizado</translation>
+</message>
+<message>
+<source>Custom network profile</source>
+<translation>Perfil de rede personalizado</translation>
+</message>
+<message>
+<source>GDAL configuration options, one KEY=VALUE per line:</source>
+<translation>Opções de configuração do GDAL, uma CHAVE=VALOR por linha:</translation>
+</message>
+<message>
+<source>Batch:</source>
+<translation>Lote:</translation>
+</message>
+<message>
+<source>Number of images, from the top of the list, loaded by &quot;Load top N&quot;</source>
+<translation>Número de imagens, a partir do topo da lista, carregadas por &quot;Carregar top N&quot;</translation>
+</message>
+<message>
+<source>Load top N</source>
+<translation>Carregar top N</translation>
+</message>
+<message>
+<source>Load selected</source>
+<translation>Carregar selecionadas</translation>
+</message>
+<message>
+<source>Load every selected row (Ctrl/Shift+click to select several)</source>
+<translation>Carregar todas as linhas selecionadas (Ctrl/Shift+clique para selecionar várias)</translation>
+</message>
+<message>
+<source>Loading images</source>
+<translation>Carregando imagens</translation>
+</message>
+<message>
+<source>Batch loading cancelled.</source>
+<translation>Carregamento em lote cancelado.</translation>
+</message>
+<message>
+<source>{} of {} images could not be loaded, see the log for details.</source>
+<translation>{} de {} imagens não puderam ser carregadas, veja o log para detalhes.</translation>
+</message>
+<message>
+<source>Load mosaic</source>
+<translation>Carregar mosaico</translation>
+</message>
+<message>
+<source>One layer with the least cloudy image of every tile in the map extent, from the selected row&apos;s acquisition if a row is selected</source>
+<translation>Uma camada com a imagem menos nublada de cada tile na extensão do mapa, da aquisição da linha selecionada se houver uma</translation>
+</message>
+<message>
+<source>Export map extent…</source>
+<translation>Exportar extensão do mapa…</translation>
+</message>
+<message>
+<source>Save the chosen image, clipped to the map extent, as a local Cloud Optimized GeoTIFF</source>
+<translation>Salvar a imagem escolhida, recortada na extensão do mapa, como um Cloud Optimized GeoTIFF local</translation>
+</message>
+<message>
+<source>Export map extent</source>
+<translation>Exportar extensão do mapa</translation>
+</message>
+<message>
+<source>GeoTIFF (*.tif *.tiff)</source>
+<translation>GeoTIFF (*.tif *.tiff)</translation>
+</message>
+<message>
+<source>Exporting</source>
+<translation>Exportando</translation>
+</message>
+<message>
+<source>Cancel</source>
+<translation>Cancelar</translation>
+</message>
+<message>
+<source>Export</source>
+<translation>Exportar</translation>
+</message>
+<message>
+<source>Export error</source>
+<translation>Erro na exportação</translation>
+</message>
+<message>
+<source>Export cancelled. Export to the same file again to resume.</source>
+<translation>Exportação cancelada. Exporte para o mesmo arquivo novamente para retomar.</translation>
+</message>
+<message>
+<source>Resuming an interrupted export.</source>
+<translation>Retomando uma exportação interrompida.</translation>
+</message>
+<message>
+<source>Resolution:</source>
+<translation>Resolução:</translation>
+</message>
+<message>
+<source>Match map scale</source>
+<translation>Escala do mapa</translation>
+</message>
+<message>
+<source>Full resolution</source>
+<translation>Resolução total</translation>
+</message>
+<message>
+<source>Overview 1 (1/2)</source>
+<translation>Visão geral 1 (1/2)</translation>
+</message>
+<message>
+<source>Overview 2 (1/4)</source>
+<translation>Visão geral 2 (1/4)</translation>
+</message>
+<message>
+<source>Overview 3 (1/8)</source>
+<translation>Visão geral 3 (1/8)</translation>
+</message>
+<message>
+<source>Overview 4 (1/16)</source>
+<translation>Visão geral 4 (1/16)</translation>
+</message>
+<message>
+<source>Reduced resolutions read the images&apos; overviews: much faster for regional views</source>
+<translation>Resoluções reduzidas leem as visões gerais das imagens: muito mais rápido para vistas regionais</translation>
+</message>
+<message>
+<source>Rebuild the active layer, loaded at reduced resolution, at full resolution</source>
+<translation>Recriar a camada ativa, carregada em resolução reduzida, na resolução total</translation>
+</message>
+<message>
+<source>Select a layer that was loaded at reduced resolution.</source>
+<translation>Selecione uma camada carregada em resolução reduzida.</translation>
+</message>
+<message>
+<source>Show duplicates</source>
+<translation>Mostrar duplicadas</translation>
+</message>
+<message>
+<source>Also list older or cloudier copies of the same acquisition (same platform, tile and time), e.g. reprocessed items</source>
+<translation>Listar também cópias mais antigas ou com mais nuvens da mesma aquisição (mesma plataforma, tile e horário), p. ex. itens reprocessados</translation>
+</message>
+<message>
+<source>{} duplicate images hidden</source>
+<translation>{} imagens duplicadas ocultas</translation>
+</message>
+<message>
+<source>Temporal composite…</source>
+<translation>Composição temporal…</translation>
+</message>
+<message>
+<source>Per-pixel median (or percentile) of the selected images, or of the top N, over the map extent, saved as a local Cloud Optimized GeoTIFF</source>
+<translation>Mediana (ou percentil) por pixel das imagens selecionadas, ou das top N, na extensão do mapa, salva como um Cloud Optimized GeoTIFF local</translation>
+</message>
+<message>
+<source>Temporal composite</source>
+<translation>Composição temporal</translation>
+</message>
+<message>
+<source>Composite</source>
+<translation>Composição</translation>
+</message>
+<message>
+<source>A composite needs at least two images.</source>
+<translation>Uma composição precisa de pelo menos duas imagens.</translation>
+</message>
+<message>
+<source>Per-pixel statistic of {} images:</source>
+<translation>Estatística por pixel de {} imagens:</translation>
+</message>
+<message>
+<source>Median</source>
+<translation>Mediana</translation>
+</message>
+<message>
+<source>10th percentile</source>
+<translation>Percentil 10</translation>
+</message>
+<message>
+<source>25th percentile</source>
+<translation>Percentil 25</translation>
+</message>
+<message>
+<source>75th percentile</source>
+<translation>Percentil 75</translation>
+</message>
+<message>
+<source>90th percentile</source>
+<translation>Percentil 90</translation>
+</message>
+<message>
+<source>Compositing</source>
+<translation>Compondo</translation>
+</message>
+<message>
+<source>Composite cancelled.</source>
+<translation>Composição cancelada.</translation>
+</message>
+<message>
+<source>Mask clouds and shadows</source>
+<translation>Mascarar nuvens e sombras</translation>
+</message>
+<message>
+<source>Hide cloud, cirrus and shadow pixels using the Sentinel-2 scene classification (SCL) or Landsat QA_PIXEL band</source>
+<translation>Ocultar pixels de nuvem, cirros e sombra usando a classificação de cena do Sentinel-2 (SCL) ou a banda QA_PIXEL do Landsat</translation>
+</message>
+<message>
+<source>AOI clear (%)</source>
+<translation>Limpo na AOI (%)</translation>
+</message>
+<message>
+<source>Rank by clear sky</source>
+<translation>Ordenar por céu limpo</translation>
+</message>
+<message>
+<source>Measure how clear the map extent is in the top results, from a low-resolution read of their SCL / QA_PIXEL band, and rank by it</source>
+<translation>Medir quão limpa está a extensão do mapa nos primeiros resultados, com uma leitura em baixa resolução da banda SCL / QA_PIXEL, e ordenar por isso</translation>
+</message>
+<message>
+<source>Measuring clear sky over the map extent…</source>
+<translation>Medindo céu limpo na extensão do mapa…</translation>
+</message>
+<message>
+<source>Clear sky measured over the map extent for {} images</source>
+<translation>Céu limpo medido na extensão do mapa para {} imagens</translation>
+</message>
+<message>
+<source>Clear sky error</source>
+<translation>Erro ao medir céu limpo</translation>
+</message>
 </context>
 </TS>
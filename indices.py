@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Spectral index "compositions" computed on the fly by GDAL.
+
+An index layer is a VRT with a single derived band whose pixel function
+lives in this module. GDAL calls it for every block it renders, with NumPy
+arrays holding just the source bands for that window, so nothing is
+materialized beyond the blocks on screen. The VRT references the function
+by its module path; the module is registered as trusted with GDAL's VRT
+Python support, which keeps arbitrary inline code disabled.
+
+Band roles (``nir``, ``red``...) are mapped to each collection's asset keys,
+and DN values are converted to reflectance with the item's scale/offset
+before the index is computed.
+"""
+from collections import namedtuple
+
+# Output nodata of every index band.
+INDEX_NODATA = -9999.0
+
+SpectralIndex = namedtuple("SpectralIndex", "name function bands")
+
+INDICES = [
+    ("NDVI", "Vegetation",  "normalized_difference", ("nir", "red")),
+    ("NDWI", "Water",       "normalized_difference", ("green", "nir")),
+    ("MNDWI", "Open Water", "normalized_difference", ("green", "swir1")),
+    ("NDMI", "Moisture",    "normalized_difference", ("nir", "swir1")),
+    ("NBR", "Burn Ratio",   "normalized_difference", ("nir", "swir2")),
+    ("NDBI", "Built-up",    "normalized_difference", ("swir1", "nir")),
+    ("SAVI", "Soil-Adjusted Vegetation", "savi",     ("nir", "red")),
+    ("EVI", "Enhanced Vegetation",       "evi",      ("nir", "red", "blue")),
+]
+
+BAND_ROLES = {
+    "sentinel-2-l2a": {
+        "blue": "B02", "green": "B03", "red": "B04",
+        "nir": "B08", "swir1": "B11", "swir2": "B12",
+    },
+    "landsat-c2-l2": {
+        "blue": "blue", "green": "green", "red": "red",
+        "nir": "nir08", "swir1": "swir16", "swir2": "swir22",
+    },
+}
+
+
+def compositions(collection):
+    """Index compositions for ``collection``, keyed like the RGB ones."""
+    roles = BAND_ROLES.get(collection)
+    if roles is None:
+        return {}
+    result = {}
+    for name, label, function, index_roles in INDICES:
+        bands = tuple(roles[r] for r in index_roles)
+        result[f"{name} – {label} ({', '.join(bands)})"] = SpectralIndex(name, function, bands)
+    return result
+
+
+def reflectance_scaling(item, key, collection):
+    """``(scale, offset)`` turning an asset's DN into surface reflectance."""
+    fields = dict(item.properties)
+    fields.update(item.assets[key].extra_fields)
+    raster_bands = fields.get("raster:bands") or []
+    if raster_bands and "scale" in raster_bands[0]:
+        return raster_bands[0]["scale"], raster_bands[0].get("offset", 0.0)
+    if collection == "sentinel-2-l2a":
+        # Processing baseline 04.00 (January 2022) added BOA_ADD_OFFSET.
+        baseline = str(item.properties.get("s2:processing_baseline", "00.00"))
+        return 0.0001, -0.1 if baseline >= "04.00" else 0.0
+    if collection == "landsat-c2-l2":
+        return 0.0000275, -0.2
+    return 1.0, 0.0
+
+
+def pixel_function_name(function):
+    return f"{__name__}.{function}"
+
+
+def enable(module=__name__):
+    """Allow GDAL to call the pixel functions of ``module`` (this one by default)."""
+    from osgeo import gdal
+    current = gdal.GetConfigOption("GDAL_VRT_PYTHON_TRUSTED_MODULES") or ""
+    modules = [m for m in current.split(",") if m]
+    if module not in modules:
+        modules.append(module)
+        gdal.SetConfigOption("GDAL_VRT_PYTHON_TRUSTED_MODULES", ",".join(modules))
+
+
+# Pixel functions. GDAL passes the source blocks in ``in_ar`` and the
+# <PixelFunctionArguments> attributes, as strings, in ``kwargs``.
+
+def _reflectance(in_ar, kwargs):
+    import numpy as np
+    scales  = [float(v) for v in kwargs["scales"].split(",")]
+    offsets = [float(v) for v in kwargs["offsets"].split(",")]
+    nodata  = float(kwargs.get("src_nodata", 0))
+    invalid = np.zeros(in_ar[0].shape, dtype=bool)
+    bands = []
+    for arr, scale, offset in zip(in_ar, scales, offsets):
+        invalid |= arr == nodata
+        bands.append(arr.astype(np.float32) * scale + offset)
+    return bands, invalid
+
+
+def _finish(out_ar, value, invalid):
+    import numpy as np
+    invalid = invalid | ~np.isfinite(value)
+    out_ar[:] = np.where(invalid, INDEX_NODATA, value)
+
+
+def normalized_difference(in_ar, out_ar, xoff, yoff, xsize, ysize,
+                          raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+    import numpy as np
+    (a, b), invalid = _reflectance(in_ar, kwargs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _finish(out_ar, (a - b) / (a + b), invalid)
+
+
+def savi(in_ar, out_ar, xoff, yoff, xsize, ysize,
+         raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+    import numpy as np
+    (nir, red), invalid = _reflectance(in_ar, kwargs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _finish(out_ar, 1.5 * (nir - red) / (nir + red + 0.5), invalid)
+
+
+def evi(in_ar, out_ar, xoff, yoff, xsize, ysize,
+        raster_xsize, raster_ysize, buf_radius, gt, **kwargs):
+    import numpy as np
+    (nir, red, blue), invalid = _reflectance(in_ar, kwargs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _finish(out_ar, 2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1), invalid)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""GDAL network settings for the plugin's /vsicurl/ layers.
+
+GDAL's defaults are tuned for generic HTTP files: it probes the parent
+"directory" for sidecar files, issues one small range request per block and
+opens a new HTTP/1.1 connection per request. For the COGs on Planetary
+Computer storage none of that is useful, so the plugin applies a managed
+profile when it loads a layer.
+
+Where GDAL supports path-specific options (3.6+), the profile is scoped to
+the storage containers the plugin has actually read from, leaving other
+layers in the project untouched. Cache sizes are process-wide by nature;
+those, and everything on older GDAL versions, are set globally and restored
+when the plugin is unloaded.
+"""
+import threading
+
+from . import plugin_settings
+from .token_manager import split_blob_href
+
+PROFILES = {
+    "conservative": {
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+        "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.TIF,.tiff,.TIFF",
+        "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+        "GDAL_HTTP_MAX_RETRY": "3",
+        "GDAL_HTTP_RETRY_DELAY": "1",
+        "VSI_CACHE": "TRUE",
+        "VSI_CACHE_SIZE": str(32 * 1024 * 1024),
+    },
+    "aggressive": {
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+        "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.TIF,.tiff,.TIFF",
+        "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+        "GDAL_HTTP_MULTIPLEX": "YES",
+        "GDAL_HTTP_VERSION": "2",
+        "GDAL_HTTP_MAX_RETRY": "5",
+        "GDAL_HTTP_RETRY_DELAY": "0.5",
+        "CPL_VSIL_CURL_USE_HEAD": "NO",
+        "GDAL_INGESTED_BYTES_AT_OPEN": "32768",
+        "VSI_CACHE": "TRUE",
+        "VSI_CACHE_SIZE": str(128 * 1024 * 1024),
+        "CPL_VSIL_CURL_CACHE_SIZE": str(256 * 1024 * 1024),
+    },
+}
+
+# Options GDAL only reads from the global configuration.
+GLOBAL_ONLY = {"VSI_CACHE", "VSI_CACHE_SIZE", "CPL_VSIL_CURL_CACHE_SIZE"}
+
+_lock     = threading.Lock()
+_prefixes = set()
+_saved    = {}
+_active   = None  # options currently applied
+
+
+def profile_names():
+    return list(PROFILES) + ["custom"]
+
+
+def parse_custom(text):
+    """Parse ``KEY=VALUE`` pairs separated by ``;`` or new lines."""
+    options = {}
+    for chunk in text.replace("\n", ";").split(";"):
+        if "=" in chunk:
+            key, value = chunk.split("=", 1)
+            if key.strip():
+                options[key.strip().upper()] = value.strip()
+    return options
+
+
+def profile_options(name=None):
+    name = name or plugin_settings.value("io/profile")
+    if name == "custom":
+        return parse_custom(plugin_settings.value("io/custom_options"))
+    return dict(PROFILES.get(name, PROFILES["conservative"]))
+
+
+def _vsicurl_prefix(href):
+    parts = split_blob_href(href)
+    if parts is None:
+        return None
+    account, container = parts
+    return f"/vsicurl/https://{account}.blob.core.windows.net/{container}/"
+
+
+def _set_global(gdal, key, value):
+    if key not in _saved:
+        _saved[key] = gdal.GetConfigOption(key)
+    gdal.SetConfigOption(key, value)
+
+
+def apply(hrefs, name=None):
+    """Apply the selected profile to the containers behind ``hrefs``.
+
+    Call it before opening the files: GDAL reads the options when a
+    dataset is opened.
+    """
+    global _active
+    from osgeo import gdal
+
+    name = name or plugin_settings.value("io/profile")
+    options = profile_options(name)
+    scoped = hasattr(gdal, "SetPathSpecificOption")
+    prefixes = {p for p in (_vsicurl_prefix(h) for h in hrefs) if p}
+
+    with _lock:
+        if options != _active:
+            # Another profile, or edited custom options: start again from a
+            # clean slate and redo the containers already in use.
+            prefixes |= _prefixes
+            _clear(gdal)
+            _active = options
+        new_prefixes = prefixes - _prefixes if scoped else set()
+        for key, value in options.items():
+            if key in GLOBAL_ONLY or not scoped:
+                _set_global(gdal, key, value)
+            else:
+                for prefix in new_prefixes:
+                    gdal.SetPathSpecificOption(prefix, key, value)
+        _prefixes.update(new_prefixes)
+
+
+def refresh():
+    """Re-apply the selected profile to the containers already in use, e.g.
+    after it was changed in the dialog. Does nothing before the first load."""
+    if _active is not None:
+        apply([])
+
+
+def _clear(gdal):
+    if hasattr(gdal, "ClearPathSpecificOptions"):
+        for prefix in _prefixes:
+            gdal.ClearPathSpecificOptions(prefix)
+    _prefixes.clear()
+    for key, value in _saved.items():
+        gdal.SetConfigOption(key, value)
+    _saved.clear()
+
+
+def reset():
+    """Undo everything the plugin changed; called when it is unloaded."""
+    global _active
+    try:
+        from osgeo import gdal
+    except ImportError:
+        return
+    with _lock:
+        _clear(gdal)
+        _active = None
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Single-layer mosaics of several STAC items.
+
+A canvas extent often spans several Sentinel-2 MGRS tiles or Landsat
+path/rows. Instead of one layer per item, the mosaic picks the best
+(least cloudy) item per footprint and stitches their band stacks into one
+VRT. Items in a different UTM zone than the majority are wrapped in a
+warped VRT first, so the whole mosaic shares one CRS.
+"""
+from .vrt_builder import (
+    bounds_in, build_item_vrt, composition_nodata, epsg_from_fields, gdal_build_vrt,
+    majority_epsg, view_resolution, vrt_path,
+)
+
+
+def _cloud_cover(item):
+    return item.properties.get("eo:cloud_cover", 100)
+
+
+def acquisition_key(item):
+    """Acquisition date plus orbit (S2 relative orbit / Landsat WRS path)."""
+    props = item.properties
+    orbit = props.get("sat:relative_orbit", props.get("landsat:wrs_path"))
+    return (props.get("datetime") or "")[:10], orbit
+
+
+def footprint_key(item):
+    """The tile an item covers: MGRS tile or WRS path/row, else the item id."""
+    props = item.properties
+    if props.get("s2:mgrs_tile"):
+        return props["s2:mgrs_tile"]
+    if props.get("landsat:wrs_path") is not None:
+        return props["landsat:wrs_path"], props.get("landsat:wrs_row")
+    return item.id
+
+
+def select_items(items, reference=None, footprint=footprint_key,
+                 acquisition=acquisition_key, cloud=_cloud_cover):
+    """Best item per footprint, ranked by cloud cover.
+
+    With a ``reference`` item only items from the same acquisition (date and
+    orbit) are considered, which gives a seamless single-pass mosaic. The key
+    functions default to reading pystac Items and can be swapped for other
+    row types.
+    """
+    if reference is not None:
+        wanted = acquisition(reference)
+        items = [i for i in items if acquisition(i) == wanted]
+    best = {}
+    for item in items:
+        key = footprint(item)
+        if key not in best or cloud(item) < cloud(best[key]):
+            best[key] = item
+    return sorted(best.values(), key=cloud)
+
+
+def build_mosaic_vrt(items, bands, collection, sign, bbox=None, width_px=None, overview=None,
+                     mask=None):
+    """Write one VRT mosaicking ``items`` (best first) and return its path.
+
+    With ``width_px`` (the canvas width) the items are built at the
+    resolution of the current view; ``overview`` pins an overview level.
+    ``mask`` (a ``CloudMask``) masks clouds in every item.
+    """
+    from osgeo import gdal
+
+    if not items:
+        raise ValueError("No images to mosaic")
+    target = majority_epsg(items)
+
+    resolution = None
+    if bbox is not None and width_px and target is not None:
+        resolution = view_resolution(target, bbox, width_px)
+
+    nodata = composition_nodata(bands)
+    sources = []
+    for item in items:
+        path = build_item_vrt(item, bands, collection, sign, resolution, overview, mask)
+        epsg = epsg_from_fields(item.properties)
+        if target is not None and epsg is not None and epsg != target:
+            warped = vrt_path(f"{item.id}_warp", target, *bands, resolution, overview,
+                              *([mask] if mask else []))
+            # With a mask, let the warper use it (it includes the nodata).
+            ds = gdal.Warp(
+                warped, path, format="VRT", dstSRS=f"EPSG:{target}",
+                srcNodata="None" if mask else nodata, dstNodata=nodata, resampleAlg="near")
+            if ds is None:
+                raise RuntimeError(gdal.GetLastErrorMsg() or f"Could not reproject {item.id}")
+            ds = None
+            path = warped
+        sources.append(path)
+
+    options = {"srcNodata": nodata, "VRTNodata": nodata, "resolution": "highest"}
+    if bbox is not None and target is not None:
+        options["outputBounds"] = bounds_in(target, bbox)
+    # BuildVRT draws later sources on top, so the least cloudy goes last.
+    ids = sorted(item.id for item in items)
+    out = vrt_path(f"mosaic_{len(items)}", *ids, *bands, resolution, overview,
+                   *([mask] if mask else []))
+    return gdal_build_vrt(list(reversed(sources)), out, separate=False, **options)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Persistent plugin options stored in QSettings.
+
+Every key lives under the ``sentinel_stac_loader/`` group. The type of a
+value is taken from its default, so callers always get an int back for an
+int option even when QSettings stored it as a string.
+"""
+from qgis.PyQt.QtCore import QSettings
+
+_GROUP = "sentinel_stac_loader"
+
+DEFAULTS = {
+    # Upper bound on the number of items a single search returns.
+    "search/max_items": 500,
+    # List every copy of an acquisition instead of only the best one.
+    "search/show_duplicates": False,
+    # On-disk search cache (see search_cache.py). Results for the last
+    # "recent_days" days expire after "recent_ttl_hours", since new scenes
+    # are still being ingested; older days after "search_ttl_hours".
+    "cache/search_enabled": True,
+    "cache/search_ttl_hours": 24 * 30,
+    "cache/recent_ttl_hours": 1,
+    "cache/recent_days": 3,
+    # Preview thumbnails (see thumbnail_cache.py).
+    "cache/thumbnail_memory_items": 64,
+    "cache/thumbnail_disk_mb": 100,
+    # Background thumbnail prefetch after a search and around the selection.
+    "prefetch/top_n": 12,
+    "prefetch/neighbours": 3,
+    "prefetch/workers": 3,
+    # GDAL network profile for loaded layers (see io_profile.py).
+    "io/profile": "conservative",
+    "io/custom_options": "",
+    # Number of VRTs built at the same time by batch loads.
+    "load/max_parallel": 4,
+    # "full", "view" (match the map scale) or a pinned overview level.
+    "load/resolution": "full",
+    # Concurrent block reads during a map-extent export.
+    "export/workers": 4,
+    # Temporal composite statistic ("median", "p10"...; see composite.py)
+    # and worker processes (0 = one per CPU core, less one).
+    "composite/statistic": "median",
+    "composite/workers": 0,
+    # Cloud masking (see cloud_mask.py): SCL classes and QA_PIXEL bits to hide.
+    "mask/enabled": False,
+    "mask/scl_classes": "1,3,8,9,10",
+    "mask/qa_bits": "1,2,3,4",
+    # "Rank by clear sky": results measured and concurrent reads.
+    "rank/clear_top_n": 50,
+    "rank/clear_workers": 8,
+    # Folder of pre-built wheels for dependency installs; with "offline"
+    # set, pip takes packages from there only (no index access).
+    "install/wheelhouse": "",
+    "install/offline": False,
+    # Interpreter and user site-packages found at startup, cached for the
+    # QGIS/Python install in "startup/environment" (see dependency_manager.py).
+    "startup/environment": "",
+    "startup/python": "",
+    "startup/user_site": "",
+}
+
+
+def value(key, default=None):
+    """Return the stored value for ``key`` or its default."""
+    if default is None:
+        default = DEFAULTS.get(key)
+    raw = QSettings().value(f"{_GROUP}/{key}", default)
+    if raw is None or default is None:
+        return raw
+    try:
+        if isinstance(default, bool):
+            return str(raw).lower() in ("1", "true", "yes")
+        return type(default)(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def set_value(key, val):
+    QSettings().setValue(f"{_GROUP}/{key}", val)
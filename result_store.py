@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Compact, column-oriented storage of search results.
+
+A pystac Item keeps every asset, link and property as Python objects, a few
+hundred kilobytes each once parsed. The results table only needs a handful of
+fields, so each item is reduced to one row across typed columns (``array``
+for the numbers, interned strings for the values repeated across rows) plus
+its JSON, zlib-compressed like the search cache stores it. The full Item is
+rebuilt only for the rows that are previewed or loaded, and the last few are
+kept in a small LRU.
+
+Rows are addressed by integer handles and the store is append-only, so
+several views (the current results, the superset kept for local refiltering)
+can share one store.
+
+Planetary Computer often lists the same acquisition more than once, e.g.
+after a reprocessing with a newer processing baseline. Rows with the same
+platform, tile and datetime are duplicates of each other; ``deduplicate``
+keeps the newest version (then the least cloudy) in one pass.
+
+``aoi_clear`` holds the clear-sky fraction over the area of interest, NaN
+until it is computed for a row (see clear_sky.py).
+"""
+import json
+import math
+import sys
+import threading
+import zlib
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from .coverage import coverage_fractions, footprint
+from .mosaic import acquisition_key, footprint_key
+
+# What the worker thread hands over for each item.
+CompactItem = namedtuple(
+    "CompactItem",
+    "id date timestamp cloud bbox tile acquisition platform version preview"
+    " footprint coverage payload")
+
+# Read-only view of one stored row.
+ResultRow = namedtuple(
+    "ResultRow", "handle id date timestamp cloud bbox tile acquisition preview coverage")
+
+HYDRATED_ITEMS = 32
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return math.nan
+
+
+def _version(props):
+    """Sortable processing version: baseline, then generation/update time."""
+    baseline = props.get("s2:processing_baseline") or ""
+    produced = (props.get("s2:generation_time") or props.get("updated")
+                or props.get("created") or "")
+    return f"{baseline}|{produced}"
+
+
+def compact(item):
+    """Reduce a pystac Item to a ``CompactItem``; safe to call off the GUI thread."""
+    props = item.properties
+    datetime_str = props.get("datetime") or ""
+    bbox = item.bbox or (math.nan,) * 4
+    preview = item.assets.get("rendered_preview")
+    payload = zlib.compress(json.dumps(
+        item.to_dict(include_self_link=False, transform_hrefs=False)).encode("utf-8"))
+    return CompactItem(
+        item.id,
+        datetime_str[:10],
+        _timestamp(datetime_str),
+        float(props["eo:cloud_cover"]) if props.get("eo:cloud_cover") is not None else math.nan,
+        (bbox[0], bbox[1], bbox[-2], bbox[-1]),
+        str(footprint_key(item)),
+        "/".join(str(part) for part in acquisition_key(item)),
+        props.get("platform") or "",
+        _version(props),
+        preview.href if preview else None,
+        footprint(item),
+        0.0,
+        payload,
+    )
+
+
+def compact_page(items, bbox):
+    """``compact`` a page of items, with their coverage of the lon/lat ``bbox``."""
+    records = [compact(item) for item in items]
+    fractions = coverage_fractions([r.footprint for r in records], bbox)
+    return [r._replace(coverage=f) for r, f in zip(records, fractions)]
+
+
+class ResultStore:
+    """Append-only columns of search results; rows are integer handles."""
+
+    def __init__(self):
+        self.ids          = []
+        self.dates        = []
+        self.timestamps   = array("d")
+        self.clouds       = array("d")
+        self.bounds       = array("d")
+        self.tiles        = []
+        self.acquisitions = []
+        self.platforms    = []
+        self.versions     = []
+        self.previews     = []
+        self.footprints   = []
+        self.coverage     = array("d")
+        self.aoi_clear    = array("d")
+        self._payloads    = []
+        self._hydrated    = OrderedDict()
+        self._lock        = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, record):
+        """Append a ``CompactItem`` and return its handle."""
+        handle = len(self.ids)
+        self.ids.append(record.id)
+        self.dates.append(sys.intern(record.date))
+        self.timestamps.append(record.timestamp)
+        self.clouds.append(record.cloud)
+        self.bounds.extend(record.bbox)
+        self.tiles.append(sys.intern(record.tile))
+        self.acquisitions.append(sys.intern(record.acquisition))
+        self.platforms.append(sys.intern(record.platform))
+        self.versions.append(record.version)
+        self.previews.append(record.preview)
+        self.footprints.append(record.footprint)
+        self.coverage.append(record.coverage)
+        self.aoi_clear.append(math.nan)
+        self._payloads.append(record.payload)
+        return handle
+
+    def extend(self, records):
+        return [self.add(r) for r in records]
+
+    def bbox(self, handle):
+        return tuple(self.bounds[4 * handle:4 * handle + 4])
+
+    def row(self, handle):
+        return ResultRow(
+            handle, self.ids[handle], self.dates[handle], self.timestamps[handle],
+            self.clouds[handle], self.bbox(handle), self.tiles[handle],
+            self.acquisitions[handle], self.previews[handle], self.coverage[handle])
+
+    def duplicate_key(self, handle):
+        return self.platforms[handle], self.tiles[handle], self.timestamps[handle]
+
+    def supersedes(self, handle, other):
+        """True if ``handle`` is a better copy of the same acquisition as ``other``."""
+        if self.versions[handle] != self.versions[other]:
+            return self.versions[handle] > self.versions[other]
+        cloud, other_cloud = self.clouds[handle], self.clouds[other]
+        return not math.isnan(cloud) and (math.isnan(other_cloud) or cloud < other_cloud)
+
+    def deduplicate(self, handles):
+        """``{duplicate_key: best handle}`` over ``handles``, in first-seen order."""
+        best = {}
+        for handle in handles:
+            key = self.duplicate_key(handle)
+            current = best.get(key)
+            if current is None or self.supersedes(handle, current):
+                best[key] = handle
+        return best
+
+    def update_coverage(self, handles, bbox):
+        """Recompute the coverage of ``handles`` for a new area of interest."""
+        fractions = coverage_fractions([self.footprints[h] for h in handles], bbox)
+        for handle, fraction in zip(handles, fractions):
+            self.coverage[handle] = fraction
+            # The clear fraction was measured over the previous area.
+            self.aoi_clear[handle] = math.nan
+
+    def effective_cloud(self, handle):
+        """Cloud cover in percent: the AOI-local figure when known, else the
+        scene-wide ``eo:cloud_cover``."""
+        clear = self.aoi_clear[handle]
+        return self.clouds[handle] if math.isnan(clear) else 100.0 * (1.0 - clear)
+
+    def item(self, handle):
+        """The full pystac Item of a row, rebuilt from its compressed JSON."""
+        with self._lock:
+            item = self._hydrated.get(handle)
+            if item is not None:
+                self._hydrated.move_to_end(handle)
+                return item
+        import pystac
+        item = pystac.Item.from_dict(json.loads(zlib.decompress(self._payloads[handle])))
+        with self._lock:
+            self._hydrated[handle] = item
+            while len(self._hydrated) > HYDRATED_ITEMS:
+                self._hydrated.popitem(last=False)
+        return item
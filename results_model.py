@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""Table model behind the search results view.
+
+The view only asks the model for the cells it is about to paint, so a list
+of thousands of results costs no more to display than a screenful, and no
+per-cell widget items are kept around. Rows stay ordered by the active sort
+column: pages arriving from a running search are inserted at their sorted
+position, and clicking a header re-sorts the rows in place. With
+``deduplicate`` on, only the best copy of each acquisition is shown (see
+``ResultStore.deduplicate``); a better copy arriving later replaces the row.
+Once the AOI clear-sky fraction of a row is known it replaces the scene
+cloud cover in its score.
+
+The model itself only holds row handles into a ``ResultStore``; full items
+are rebuilt from the store on demand.
+"""
+import bisect
+import math
+
+from qgis.PyQt.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from .coverage import score
+from .result_store import ResultStore
+
+try:
+    class _Qt:
+        Display    = Qt.ItemDataRole.DisplayRole
+        Alignment  = Qt.ItemDataRole.TextAlignmentRole
+        ToolTip    = Qt.ItemDataRole.ToolTipRole
+        Horizontal = Qt.Orientation.Horizontal
+        Ascending  = Qt.SortOrder.AscendingOrder
+        AlignRight = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+except AttributeError:
+    class _Qt:
+        Display    = Qt.DisplayRole
+        Alignment  = Qt.TextAlignmentRole
+        ToolTip    = Qt.ToolTipRole
+        Horizontal = Qt.Horizontal
+        Ascending  = Qt.AscendingOrder
+        AlignRight = Qt.AlignRight | Qt.AlignVCenter
+
+COL_INDEX, COL_DATE, COL_CLOUDS, COL_COVERAGE, COL_CLEAR, COL_SCORE, COL_ID = range(7)
+HEADERS = ["Index", "Image date", "Clouds (%)", "Coverage (%)", "AOI clear (%)", "Score", "ID"]
+
+# Appends larger than this re-sort everything behind a single model reset
+# instead of sending one insert notification per row.
+RESET_THRESHOLD = 256
+
+
+def _cloud_cover(store, handle):
+    cloud = store.clouds[handle]
+    return 100.0 if math.isnan(cloud) else cloud
+
+
+def _score(store, handle):
+    return score(store.coverage[handle], store.effective_cloud(handle))
+
+
+def _aoi_clear(store, handle):
+    # Rows not measured yet sort below a fully cloudy one.
+    clear = store.aoi_clear[handle]
+    return -1.0 if math.isnan(clear) else clear
+
+
+def rank_key(store, handle):
+    """Default ranking, used by the Index column and to apply the row cap:
+    best score first, then least cloudy."""
+    return -_score(store, handle), _cloud_cover(store, handle)
+
+
+SORT_KEYS = {
+    COL_INDEX:    rank_key,
+    COL_DATE:     lambda store, handle: store.dates[handle],
+    COL_CLOUDS:   _cloud_cover,
+    COL_COVERAGE: lambda store, handle: store.coverage[handle],
+    COL_CLEAR:    _aoi_clear,
+    COL_SCORE:    _score,
+    COL_ID:       lambda store, handle: store.ids[handle],
+}
+
+
+class _Descending:
+    """Sort key wrapper that inverts the comparison, for descending order."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+class ResultsModel(QAbstractTableModel):
+    """Search results in display order; ``max_rows`` caps the best-ranked rows."""
+
+    def __init__(self, parent=None):
+        super(ResultsModel, self).__init__(parent)
+        self.max_rows      = 0
+        self.deduplicate   = True
+        self.store         = ResultStore()
+        self._all          = []
+        self._winners      = {}
+        self._rows         = []
+        self._keys         = []
+        self._headers      = list(HEADERS)
+        self._sort_column  = COL_INDEX
+        self._sort_order   = _Qt.Ascending
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role=_Qt.Display):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        handle = self._rows[row]
+        if role == _Qt.Display:
+            if column == COL_INDEX:
+                return str(row)
+            if column == COL_DATE:
+                return self.store.dates[handle] or "N/A"
+            if column == COL_CLOUDS:
+                cloud = self.store.clouds[handle]
+                return "N/A" if math.isnan(cloud) else f"{cloud:.2f}%"
+            if column == COL_COVERAGE:
+                return f"{100 * self.store.coverage[handle]:.0f}%"
+            if column == COL_CLEAR:
+                clear = self.store.aoi_clear[handle]
+                return "" if math.isnan(clear) else f"{100 * clear:.0f}%"
+            if column == COL_SCORE:
+                return f"{_score(self.store, handle):.2f}"
+            if column == COL_ID:
+                return self.store.ids[handle]
+        elif role == _Qt.Alignment and column in (
+                COL_INDEX, COL_CLOUDS, COL_COVERAGE, COL_CLEAR, COL_SCORE):
+            return int(_Qt.AlignRight)
+        elif role == _Qt.ToolTip and column == COL_ID:
+            return self.store.ids[handle]
+        return None
+
+    def headerData(self, section, orientation, role=_Qt.Display):
+        if orientation == _Qt.Horizontal and role == _Qt.Display:
+            return self._headers[section]
+        return None
+
+    def sort(self, column, order=_Qt.Ascending):
+        self._sort_column, self._sort_order = column, order
+        self.layoutAboutToBeChanged.emit()
+        old_rows = self._rows
+        keys = [self._key(handle) for handle in old_rows]
+        new_order = sorted(range(len(old_rows)), key=keys.__getitem__)
+        self._rows = [old_rows[r] for r in new_order]
+        self._keys = [keys[r] for r in new_order]
+        # Selection and the current index follow their rows to the new place.
+        new_row = [0] * len(new_order)
+        for new, old in enumerate(new_order):
+            new_row[old] = new
+        for index in self.persistentIndexList():
+            self.changePersistentIndex(
+                index, self.index(new_row[index.row()], index.column()))
+        self.layoutChanged.emit()
+
+    # Results
+
+    def set_headers(self, labels):
+        self._headers = list(labels)
+        self.headerDataChanged.emit(_Qt.Horizontal, 0, len(self._headers) - 1)
+
+    def sort_indicator(self):
+        """``(column, order)`` the rows are currently sorted by."""
+        return self._sort_column, self._sort_order
+
+    def handles(self):
+        """Store handles of the rows, in display order."""
+        return list(self._rows)
+
+    def row(self, row):
+        """Compact ``ResultRow`` of a table row, None when out of range."""
+        return self.store.row(self._rows[row]) if 0 <= row < len(self._rows) else None
+
+    def rows(self):
+        return [self.store.row(handle) for handle in self._rows]
+
+    def item(self, row):
+        """Full pystac Item of a table row, None when out of range."""
+        return self.store.item(self._rows[row]) if 0 <= row < len(self._rows) else None
+
+    def items(self, count=None):
+        """Full items in display order, the first ``count`` only if given."""
+        handles = self._rows[:count] if count is not None else self._rows
+        return [self.store.item(handle) for handle in handles]
+
+    def row_of(self, item_id):
+        ids = self.store.ids
+        for row, handle in enumerate(self._rows):
+            if ids[handle] == item_id:
+                return row
+        return None
+
+    def all_handles(self):
+        """Every handle given to the model, duplicates included."""
+        return list(self._all)
+
+    def hidden_count(self):
+        """Number of duplicates currently hidden."""
+        return len(self._all) - len(self._winners) if self.deduplicate else 0
+
+    def clear(self):
+        """Drop every row and start a new store."""
+        self.beginResetModel()
+        self.store = ResultStore()
+        self._all  = []
+        self._rebuild()
+        self.endResetModel()
+
+    def show(self, store, handles, bbox=None):
+        """Display ``handles`` of an existing ``store``, e.g. a kept superset,
+        recomputing their coverage when the area of interest is given."""
+        self.beginResetModel()
+        if bbox is not None:
+            store.update_coverage(handles, bbox)
+        self.store = store
+        self._all  = list(handles)
+        self._rebuild()
+        self.endResetModel()
+
+    def set_aoi_clear(self, store, fractions):
+        """Record ``{handle: clear fraction}`` and re-sort; ignored when the
+        results were replaced (a different ``store``) in the meantime."""
+        if store is not self.store:
+            return
+        for handle, fraction in fractions.items():
+            store.aoi_clear[handle] = fraction
+        self.sort(self._sort_column, self._sort_order)
+
+    def set_deduplicate(self, enabled):
+        self.beginResetModel()
+        self.deduplicate = enabled
+        self._rebuild()
+        self.endResetModel()
+
+    def append(self, records):
+        """Add ``CompactItem`` records at their sorted positions, then apply the cap."""
+        if not records:
+            return
+        handles = self.store.extend(records)
+        self._all.extend(handles)
+        if len(handles) > RESET_THRESHOLD:
+            self.beginResetModel()
+            self._rebuild()
+            self.endResetModel()
+            return
+        for handle in handles:
+            if self.deduplicate:
+                key = self.store.duplicate_key(handle)
+                current = self._winners.get(key)
+                if current is not None:
+                    if not self.store.supersedes(handle, current):
+                        continue
+                    self._remove(current)
+                self._winners[key] = handle
+            key = self._key(handle)
+            pos = bisect.bisect_right(self._keys, key)
+            self.beginInsertRows(QModelIndex(), pos, pos)
+            self._keys.insert(pos, key)
+            self._rows.insert(pos, handle)
+            self.endInsertRows()
+        self._drop(self._over_cap())
+
+    def _rebuild(self):
+        """Recompute the visible rows from ``_all``; callers wrap this in a
+        model reset."""
+        self._rows = []
+        self._keys = []
+        if self.deduplicate:
+            self._winners = self.store.deduplicate(self._all)
+            self._merge(self._winners.values())
+        else:
+            self._winners = {}
+            self._merge(self._all)
+
+    def _remove(self, handle):
+        """Remove the row showing ``handle``, if it is still shown."""
+        key = self._key(handle)
+        row = bisect.bisect_left(self._keys, key)
+        while row < len(self._rows) and not key < self._keys[row]:
+            if self._rows[row] == handle:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                del self._keys[row]
+                self.endRemoveRows()
+                return
+            row += 1
+
+    def _merge(self, handles):
+        """Re-sort with ``handles`` added; callers wrap this in a model reset."""
+        merged = self._rows + list(handles)
+        keys = [self._key(handle) for handle in merged]
+        order = sorted(range(len(merged)), key=keys.__getitem__)
+        self._rows = [merged[r] for r in order]
+        self._keys = [keys[r] for r in order]
+        self._drop(self._over_cap(), notify=False)
+
+    def _key(self, handle):
+        key = SORT_KEYS[self._sort_column](self.store, handle)
+        return key if self._sort_order == _Qt.Ascending else _Descending(key)
+
+    def _over_cap(self):
+        """Rows beyond ``max_rows`` by rank, highest row first."""
+        if not self.max_rows or len(self._rows) <= self.max_rows:
+            return []
+        if self._sort_column == COL_INDEX and self._sort_order == _Qt.Ascending:
+            return list(range(len(self._rows) - 1, self.max_rows - 1, -1))
+        ranked = sorted(range(len(self._rows)),
+                        key=lambda r: rank_key(self.store, self._rows[r]))
+        return sorted(ranked[self.max_rows:], reverse=True)
+
+    def _drop(self, rows, notify=True):
+        # ``rows`` is in descending order; contiguous runs go in one removal.
+        runs = []
+        for row in rows:
+            if runs and runs[-1][0] == row + 1:
+                runs[-1][0] = row
+            else:
+                runs.append([row, row])
+        for first, last in runs:
+            if notify:
+                self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            del self._keys[first:last + 1]
+            if notify:
+                self.endRemoveRows()
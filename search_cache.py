@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of STAC search results.
+
+Results are stored in a SQLite database inside the QGIS profile directory,
+keyed on the collection and a normalized bbox. Alongside the items the cache
+records which date intervals (and up to which cloud limit) have already been
+fetched for a key, so a repeated or overlapping search only needs to query
+the API for the days that are not covered yet. A search whose bbox lies
+inside a cached one is served from it, keeping the items that touch the
+smaller bbox.
+
+New scenes keep arriving for the last few days (acquisition plus ingestion
+latency), so coverage of those days is only trusted for a short TTL; older
+days are settled and kept for the long one.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from qgis.core import QgsApplication
+
+from . import plugin_settings
+from .coverage import coverage_fractions, footprint
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS coverage (
+    key        TEXT NOT NULL,
+    start      TEXT NOT NULL,
+    end        TEXT NOT NULL,
+    max_clouds REAL NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_key ON coverage (key);
+CREATE TABLE IF NOT EXISTS items (
+    key        TEXT NOT NULL,
+    id         TEXT NOT NULL,
+    day        TEXT NOT NULL,
+    cloud      REAL NOT NULL,
+    payload    BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (key, id)
+);
+"""
+
+_lock = threading.Lock()
+
+
+def default_cache_path():
+    return os.path.join(
+        QgsApplication.qgisSettingsDirPath(), "sentinel_stac_loader", "search_cache.sqlite")
+
+
+def _parse_day(value):
+    return date.fromisoformat(value[:10])
+
+
+def _subtract(start, end, covered):
+    """Return the parts of [start, end] (inclusive days) not inside ``covered``."""
+    missing = []
+    cursor = start
+    for c_start, c_end in sorted(covered):
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start - timedelta(days=1)))
+        cursor = max(cursor, c_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+class SearchCache:
+    """SQLite-backed store of search results with a per-entry TTL.
+
+    Safe to use from worker threads: every call opens its own short-lived
+    connection and writes are serialized by a module-level lock.
+    """
+
+    BBOX_DECIMALS = 4
+
+    def __init__(self, path=None, ttl_hours=None, recent_ttl_hours=None, recent_days=None):
+        self.path = path or default_cache_path()
+        if ttl_hours is None:
+            ttl_hours = plugin_settings.value("cache/search_ttl_hours")
+        if recent_ttl_hours is None:
+            recent_ttl_hours = plugin_settings.value("cache/recent_ttl_hours")
+        if recent_days is None:
+            recent_days = plugin_settings.value("cache/recent_days")
+        self.ttl         = float(ttl_hours) * 3600
+        self.recent_ttl  = float(recent_ttl_hours) * 3600
+        self.recent_days = int(recent_days)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with _lock, self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self.purge_expired()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def make_key(self, collection, bbox):
+        """Collection plus the bbox rounded outwards to a fixed precision."""
+        scale = 10 ** self.BBOX_DECIMALS
+        lo = [math.floor(v * scale) for v in bbox[:2]]
+        hi = [math.ceil(v * scale) for v in bbox[2:]]
+        return "{}|{}".format(collection, ",".join(str(v) for v in lo + hi))
+
+    def _containing_keys(self, conn, collection, bbox):
+        """Keys of the cached searches whose bbox contains ``bbox``."""
+        prefix = collection + "|"
+        want = [int(v) for v in self.make_key(collection, bbox)[len(prefix):].split(",")]
+        keys = []
+        for (key,) in conn.execute(
+                "SELECT DISTINCT key FROM coverage WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix)):
+            have = [int(v) for v in key[len(prefix):].split(",")]
+            if have[0] <= want[0] and have[1] <= want[1] \
+                    and have[2] >= want[2] and have[3] >= want[3]:
+                keys.append(key)
+        return keys
+
+    def _settled(self, timestamp):
+        """Last day that was no longer recent at ``timestamp``."""
+        return date.fromtimestamp(timestamp) - timedelta(days=self.recent_days)
+
+    def _trusted(self, end_day, fetched_at, now):
+        """Coverage of settled days lasts ``ttl``; coverage reaching into the
+        recent days at fetch time only ``recent_ttl``."""
+        ttl = self.ttl if end_day <= self._settled(fetched_at) else self.recent_ttl
+        return now - fetched_at < ttl
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with _lock, self._connect() as conn:
+            conn.execute("DELETE FROM coverage WHERE fetched_at < ?", (cutoff,))
+            conn.execute("DELETE FROM items WHERE fetched_at < ?", (cutoff,))
+
+    def lookup(self, collection, bbox, start, end, max_clouds):
+        """Return ``(items, missing)`` for a search.
+
+        ``items`` are the cached pystac Items inside the requested range and
+        cloud limit; ``missing`` is the list of ``(start, end)`` ISO date
+        pairs that still have to be fetched from the API. Items dated inside
+        ``missing`` (left by a capped or lower-cloud search) are not
+        returned, since the API fetch returns them again.
+        """
+        import pystac
+
+        key = self.make_key(collection, bbox)
+        now = time.time()
+        cutoff = now - self.ttl
+        start_day, end_day = _parse_day(start), _parse_day(end)
+        with self._connect() as conn:
+            keys = self._containing_keys(conn, collection, bbox)
+            if not keys:
+                return [], [(start, end)]
+            marks = ",".join("?" * len(keys))
+            covered = [
+                (_parse_day(s), _parse_day(e)) for s, e, fetched_at in conn.execute(
+                    f"SELECT start, end, fetched_at FROM coverage WHERE key IN ({marks}) "
+                    "AND max_clouds >= ? AND fetched_at >= ?",
+                    (*keys, max_clouds, cutoff))
+                if self._trusted(_parse_day(e), fetched_at, now)
+            ]
+            missing = _subtract(start_day, end_day, covered)
+            if len(missing) == 1 and missing[0] == (start_day, end_day):
+                return [], [(start, end)]
+            rows = conn.execute(
+                f"SELECT id, day, payload FROM items WHERE key IN ({marks}) "
+                "AND day BETWEEN ? AND ? AND cloud <= ? AND fetched_at >= ? "
+                "ORDER BY fetched_at DESC",
+                (*keys, start_day.isoformat(), end_day.isoformat(), max_clouds, cutoff)
+            ).fetchall()
+        gaps = [(s.isoformat(), e.isoformat()) for s, e in missing]
+        # An item cached under several keys is kept once, latest copy first.
+        payloads = {}
+        for item_id, day, p in rows:
+            if item_id not in payloads and not any(s <= day <= e for s, e in gaps):
+                payloads[item_id] = p
+        items = [pystac.Item.from_dict(json.loads(zlib.decompress(p)))
+                 for p in payloads.values()]
+        if keys != [key]:
+            # Served from a larger search: keep what touches this bbox.
+            fractions = coverage_fractions([footprint(i) for i in items], bbox)
+            items = [i for i, f in zip(items, fractions) if f > 0]
+        return items, gaps
+
+    def store(self, collection, bbox, start, end, max_clouds, items, complete=True):
+        """Save the items fetched for one interval.
+
+        The interval is only recorded as covered when ``complete`` is True,
+        i.e. the search was not truncated by a result cap. Its settled and
+        recent days are recorded apart, so each gets its own TTL.
+        """
+        key = self.make_key(collection, bbox)
+        now = time.time()
+        rows = []
+        for item in items:
+            payload = json.dumps(
+                item.to_dict(include_self_link=False, transform_hrefs=False),
+                separators=(",", ":"))
+            rows.append((
+                key, item.id,
+                (item.properties.get("datetime") or "")[:10],
+                item.properties.get("eo:cloud_cover", 100),
+                zlib.compress(payload.encode("utf-8")),
+                now,
+            ))
+        with _lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if complete:
+                start_day, end_day = _parse_day(start), _parse_day(end)
+                settled = self._settled(now)
+                intervals = [
+                    (start_day, min(end_day, settled)),
+                    (max(start_day, settled + timedelta(days=1)), end_day),
+                ]
+                conn.executemany(
+                    "INSERT INTO coverage VALUES (?, ?, ?, ?, ?)",
+                    [(key, s.isoformat(), e.isoformat(), max_clouds, now)
+                     for s, e in intervals if s <= e])
+
+    def clear(self):
+        with _lock, self._connect() as conn:
+            conn.execute("DELETE FROM coverage")
+            conn.execute("DELETE FROM items")
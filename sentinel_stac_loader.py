@@ -22,6 +22,7 @@
  ***************************************************************************/
 """
 import os.path
+import time
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
@@ -50,6 +51,7 @@ class SentinelSTAC:
 
     def __init__(self, iface):
         """Constructor."""
+        started = time.perf_counter()
         self.iface = iface
         
         self.deps = {
@@ -83,6 +85,7 @@ class SentinelSTAC:
             
         self.actions = []
         self.menu = self.tr(u'&Quick VRT Imagery Loader')
+        self._init_ms = (time.perf_counter() - started) * 1000
 
     def tr(self, message):
         """Qt translation API"""
@@ -119,8 +122,11 @@ class SentinelSTAC:
 
     def initGui(self):
         """Starts the plugin GUI."""
+        started = time.perf_counter()
         # Verify dependencies at startup
-        self.dependencies_ok = self.dep_manager.check_and_install()
+        self.dependencies_ok = self.dep_manager.check_and_install(
+            on_ready=self._on_dependencies_installed)
+        check_ms = (time.perf_counter() - started) * 1000
         
         icon_path = ":/plugins/sentinel_stac_loader/icon.png"
         
@@ -131,7 +137,7 @@ class SentinelSTAC:
             enabled_flag=self.dependencies_ok,
             parent=self.iface.mainWindow())
 
-        if not self.dependencies_ok:
+        if not self.dependencies_ok and not self.dep_manager.installing:
             self.iface.messageBar().pushMessage(
                 "Attention", 
                 "Missing dependencies. Click on the plugin icon to try again.", 
@@ -139,28 +145,55 @@ class SentinelSTAC:
                 duration=5
             )
 
+        # Startup timing, so that a slow import or probe creeping back into
+        # the QGIS launch path shows up in the log.
+        QgsMessageLog.logMessage(
+            'Startup: constructor {:.1f} ms, initGui {:.1f} ms (dependency check {:.1f} ms)'.format(
+                self._init_ms, (time.perf_counter() - started) * 1000, check_ms),
+            'Quick VRT Imagery Loader', MsgLevel.Info)
+
+    def _on_dependencies_installed(self):
+        self.dependencies_ok = True
+        self.main_action.setEnabled(True)
+
     def unload(self):
         """Removes the plugin from QGIS."""
         for action in self.actions:
             self.iface.removePluginMenu(self.menu, action)
             self.iface.removeToolBarIcon(action)
 
+        if self.dlg is not None:
+            self.dlg.shutdown()
+        from .task_scheduler import shutdown_shared
+        shutdown_shared()
+
+        # Drop the GDAL network options set for the plugin's layers.
+        from . import io_profile
+        io_profile.reset()
+
     def run(self):
         """Executes the plugin logic."""
         
     
-        if not self.dep_manager.check_and_install():
+        # When packages still have to be installed this returns at once and
+        # the dialog opens once the installation has finished.
+        if not self.dep_manager.check_and_install(on_ready=self.run):
             return
 
-        # Lazy import the dialog to avoid import errors when QGIS loads.
-        from .sentinel_stac_loader_dialog import SentinelSTACDialog
-        
         if self.dlg is None:
+            started = time.perf_counter()
+            # The dialog and the modules behind it are only imported on first
+            # use, which keeps them off the QGIS startup path.
+            from .sentinel_stac_loader_dialog import SentinelSTACDialog
             self.dlg = SentinelSTACDialog()
             if hasattr(self.dlg, 'btn_carregar'):
                 self.dlg.btn_carregar.clicked.connect(self.dlg.process_stac_load)
             if hasattr(self.dlg, 'btn_listar'):
                 self.dlg.btn_listar.clicked.connect(self.dlg.popular_tabela)
+            QgsMessageLog.logMessage(
+                'Dialog first opened in {:.0f} ms (imports and setup)'.format(
+                    (time.perf_counter() - started) * 1000),
+                'Quick VRT Imagery Loader', MsgLevel.Info)
 
         self.dlg.show()
         # exec_() was renamed to exec() in Qt6/PyQt6.
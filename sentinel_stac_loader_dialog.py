@@ -1,14 +1,32 @@
 # -*- coding: utf-8 -*-
+import math
 import os
+from collections import namedtuple
+from operator import attrgetter
 from qgis.PyQt import uic, QtWidgets
-from qgis.PyQt.QtCore import QThread, pyqtSignal, Qt, QCoreApplication
-from qgis.PyQt.QtGui import QPixmap
+from qgis.PyQt.QtCore import QObject, pyqtSignal, QCoreApplication, QItemSelectionModel
+from qgis.PyQt.QtGui import QImage, QPixmap
 from qgis.core import (
     QgsRasterLayer, QgsProject, QgsCoordinateTransform,
-    QgsCoordinateReferenceSystem, Qgis
+    QgsCoordinateReferenceSystem, QgsMessageLog, Qgis
 )
 from qgis.utils import iface
-import processing
+from . import cloud_mask, indices, io_profile, plugin_settings, stac_client
+from .search_cache import SearchCache
+from .thumbnail_cache import ThumbnailCache, ThumbnailPrefetcher, download_preview
+from .token_manager import shared_token_manager
+from .vrt_builder import build_item_vrt, epsg_from_fields, view_resolution
+from .mosaic import build_mosaic_vrt, select_items
+from .exporter import WindowExporter
+from .composite import TemporalComposite
+from .clear_sky import clear_fractions
+from .dependency_manager import python_executable
+from .result_store import compact_page
+from .results_model import ResultsModel
+from .task_scheduler import (
+    shared_scheduler, shared_job_scheduler, TaskCancelled,
+    PRIORITY_THUMBNAIL, PRIORITY_SEARCH, PRIORITY_LOAD
+)
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'sentinel_stac_loader_dialog_base.ui'))
@@ -28,11 +46,15 @@ except AttributeError:
         Success  = Qgis.Success
 
 try:
-    _KeepAspectRatio = Qt.AspectRatioMode.KeepAspectRatio
-    _SmoothTransform = Qt.TransformationMode.SmoothTransformation
+    _NO_UPDATE = QItemSelectionModel.SelectionFlag.NoUpdate
 except AttributeError:
-    _KeepAspectRatio = Qt.KeepAspectRatio
-    _SmoothTransform = Qt.SmoothTransformation
+    _NO_UPDATE = QItemSelectionModel.NoUpdate
+
+# Rows sampled when fitting the result columns to their contents.
+RESIZE_SAMPLE_ROWS = 200
+
+# Order of the entries in comboBox_resolution; digits are overview levels.
+RESOLUTION_MODES = ["full", "view", "1", "2", "3", "4"]
 
 
 class SentinelSTACLoader:
@@ -51,40 +73,96 @@ class SentinelSTACLoader:
         p2 = xform.transform(extent.xMaximum(), extent.yMaximum())
         return [p1.x(), p1.y(), p2.x(), p2.y()]
 
+    def get_canvas_width(self):
+        """Canvas width in screen pixels."""
+        return iface.mapCanvas().mapSettings().outputSize().width()
 
-class ThumbnailWorker(QThread):
-    thumbnail_ready = pyqtSignal(QPixmap)
-    failed          = pyqtSignal(str)
 
-    def __init__(self, url, parent=None):
+class ThumbnailWorker(QObject):
+    """Resolves one preview through the thumbnail cache, downloading it on a miss."""
+    thumbnail_ready = pyqtSignal(str, QImage)
+    failed          = pyqtSignal(str, str)
+
+    def __init__(self, item_id, url, cache, parent=None):
         super(ThumbnailWorker, self).__init__(parent)
-        self.url = url
+        self.item_id = item_id
+        self.url     = url
+        self.cache   = cache
 
-    def run(self):
+    def run(self, token):
         try:
-            if not self.url.lower().startswith(('http://', 'https://')):
-                self.failed.emit("Invalid URL")
-                return
-
-            import urllib.request
-            req = urllib.request.Request(self.url, headers={"User-Agent": "QuickVRTImageryLoader/0.6"})
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                data = resp.read()
-                
-            pixmap = QPixmap()
-            if not pixmap.loadFromData(data):
-                self.failed.emit("Could not decode image")
-                return
-            pixmap = pixmap.scaled(240, 240, _KeepAspectRatio, _SmoothTransform)
-            self.thumbnail_ready.emit(pixmap)
+            image = self.cache.get(self.item_id, self.url)
+            if image is None:
+                token.raise_if_cancelled()
+                image = download_preview(self.url)
+                self.cache.put(self.item_id, self.url, image)
+            token.raise_if_cancelled()
+            self.thumbnail_ready.emit(self.item_id, image)
+        except TaskCancelled:
+            raise
         except Exception as e:
-            self.failed.emit(str(e)[:60])
+            # A superseded request stays quiet, whichever way it ended.
+            if not token.cancelled:
+                self.failed.emit(self.item_id, str(e)[:60])
+
+def _cloud_cover(item):
+    return item.properties.get("eo:cloud_cover", 100)
+
+
+def _catalog_conforms(catalog, name):
+    """True if the STAC API advertises the named conformance class."""
+    try:
+        from pystac_client.conformance import ConformanceClasses
+        return bool(catalog.conforms_to(ConformanceClasses[name]))
+    except Exception:
+        return False
+
+
+class SearchQuery(namedtuple("SearchQuery", "collection bbox start end max_clouds")):
+    """Parameters of one search, used to decide whether a new search is a
+    narrowing of a previous one and can be answered locally."""
+
+    def contains(self, other):
+        return (
+            self.collection == other.collection
+            and self.start <= other.start and other.end <= self.end
+            and other.max_clouds <= self.max_clouds
+            and self.bbox[0] <= other.bbox[0] and self.bbox[1] <= other.bbox[1]
+            and other.bbox[2] <= self.bbox[2] and other.bbox[3] <= self.bbox[3]
+        )
 
-class SearchWorker(QThread):
-    search_done  = pyqtSignal(list)
+    def matches(self, row):
+        """True if a stored ``ResultRow`` also satisfies this query."""
+        if not (self.start <= row.date <= self.end):
+            return False
+        cloud = 100.0 if math.isnan(row.cloud) else row.cloud
+        if cloud > self.max_clouds:
+            return False
+        x0, y0, x1, y1 = row.bbox
+        if x1 < self.bbox[0] or x0 > self.bbox[2] or y1 < self.bbox[1] or y0 > self.bbox[3]:
+            return False
+        return True
+
+
+class SearchWorker(QObject):
+    """Runs a STAC search and streams the matching items page by page.
+
+    ``items_found`` is emitted once per result page, with the items already
+    reduced to ``CompactItem`` records so the GUI thread never parses them;
+    ``search_done`` with the
+    total count once every page has been fetched, and whether the search
+    returned everything (no result cap was hit). When a ``SearchCache`` is
+    given, cached items are emitted first and only the uncovered part of the
+    date range is requested from the API.
+    """
+    items_found  = pyqtSignal(list)
+    search_done  = pyqtSignal(int, bool)
     search_error = pyqtSignal(str)
 
-    def __init__(self, catalog_url, collection, bbox, start_date, end_date, max_clouds, parent=None):
+    PAGE_SIZE = 100
+
+    def __init__(self, catalog_url, collection, bbox, start_date, end_date, max_clouds,
+                 max_items=None, cache=None, parent=None):
         super(SearchWorker, self).__init__(parent)
         self.catalog_url = catalog_url
         self.collection  = collection
@@ -92,73 +170,448 @@ class SearchWorker(QThread):
         self.start_date  = start_date
         self.end_date    = end_date
         self.max_clouds  = max_clouds
-
-    def run(self):
+        self.max_items   = max_items
+        self.cache       = cache
+
+    def _search_params(self, catalog, start_date, end_date):
+        """Build search kwargs, pushing the cloud filter and sort to the
+        server when the API supports the filter/query and sort extensions."""
+        params = {
+            "collections": [self.collection],
+            "bbox":        self.bbox,
+            "datetime":    f"{start_date}/{end_date}",
+            "limit":       self.PAGE_SIZE,
+        }
+        if self.max_clouds < 100:
+            if _catalog_conforms(catalog, "FILTER"):
+                params["filter_lang"] = "cql2-json"
+                params["filter"] = {
+                    "op": "<=",
+                    "args": [{"property": "eo:cloud_cover"}, self.max_clouds],
+                }
+            elif _catalog_conforms(catalog, "QUERY"):
+                params["query"] = {"eo:cloud_cover": {"lte": self.max_clouds}}
+        if _catalog_conforms(catalog, "SORT"):
+            params["sortby"] = [{"field": "properties.eo:cloud_cover", "direction": "asc"}]
+            # Only cap on the server when it returns the best items first,
+            # otherwise the cap would keep an arbitrary subset.
+            if self.max_items:
+                params["max_items"] = self.max_items
+        return params
+
+    def _stream(self, search, collected):
+        """Emit each page as soon as it arrives, appending it to ``collected``."""
+        for page in search.pages():
+            self.token.raise_if_cancelled()
+            items = [i for i in page.items if _cloud_cover(i) <= self.max_clouds]
+            if items:
+                self.items_found.emit(compact_page(items, self.bbox))
+                collected.extend(items)
+
+    def _fetch(self, catalog, start_date, end_date):
+        """Search one date interval; return ``(items, complete)``."""
+        from pystac_client.exceptions import APIError
+
+        params = self._search_params(catalog, start_date, end_date)
+        items  = []
         try:
-            import pystac_client
-            catalog = pystac_client.Client.open(self.catalog_url)
-            search  = catalog.search(
-                collections=[self.collection],
-                bbox=self.bbox,
-                datetime=f"{self.start_date}/{self.end_date}"
-            )
-            items = list(search.get_all_items())
-            items = sorted(items, key=lambda x: x.properties.get("eo:cloud_cover", 100))
-            items = [i for i in items if i.properties.get("eo:cloud_cover", 100) <= self.max_clouds]
-            self.search_done.emit(items)
+            self._stream(catalog.search(**params), items)
+        except APIError:
+            # Catalog rejected the extension parameters on the first page;
+            # search plainly and rely on the client-side filter instead.
+            if items or not {"filter", "query", "sortby"} & params.keys():
+                raise
+            for key in ("filter", "filter_lang", "query", "sortby", "max_items"):
+                params.pop(key, None)
+            self._stream(catalog.search(**params), items)
+        complete = not ("max_items" in params and len(items) >= params["max_items"])
+        return items, complete
+
+    def run(self, token):
+        self.token = token
+        try:
+            missing  = [(self.start_date, self.end_date)]
+            total    = 0
+            complete = True
+            if self.cache is not None:
+                cached, missing = self.cache.lookup(
+                    self.collection, self.bbox,
+                    self.start_date, self.end_date, self.max_clouds)
+                if cached:
+                    self.items_found.emit(compact_page(cached, self.bbox))
+                    total += len(cached)
+
+            if missing:
+                catalog = stac_client.catalog(self.catalog_url)
+                for start_date, end_date in missing:
+                    items, interval_complete = self._fetch(catalog, start_date, end_date)
+                    total += len(items)
+                    complete = complete and interval_complete
+                    if self.cache is not None:
+                        self.cache.store(
+                            self.collection, self.bbox, start_date, end_date,
+                            self.max_clouds, items, interval_complete)
+            token.raise_if_cancelled()
+            self.search_done.emit(total, complete)
+        except TaskCancelled:
+            raise
         except Exception as e:
+            # The next search opens the catalog again, in case it changed.
+            stac_client.forget(self.catalog_url)
             self.search_error.emit(str(e))
 
-class VrtWorker(QThread):
+REDUCED_SUFFIX = " [reduced]"
+
+
+class VrtWorker(QObject):
+    """Builds one item's band-stack VRT.
+
+    ``view`` is ``(bbox, width_px)`` of the map canvas, to build the stack at
+    the resolution of the current view; ``overview`` pins an overview level.
+    ``mask`` is an optional ``CloudMask``.
+    """
     vrt_ready = pyqtSignal(str, str)
     vrt_error = pyqtSignal(str)
 
-    def __init__(self, item, bands, collection, parent=None):
+    def __init__(self, item, bands, collection, view=None, overview=None, mask=None,
+                 parent=None):
         super(VrtWorker, self).__init__(parent)
         self.item       = item
         self.bands      = bands
         self.collection = collection
+        self.view       = view
+        self.overview   = overview
+        self.mask       = mask
+
+    @property
+    def reduced(self):
+        return self.view is not None or bool(self.overview)
 
-    def run(self):
+    def full_resolution(self):
+        return VrtWorker(self.item, self.bands, self.collection, mask=self.mask)
+
+    def run(self, token):
         try:
-            import planetary_computer
-            band_hrefs = []
-            for band in self.bands:
-                asset = self.item.assets.get(band)
-                if asset:
-                    signed_href = planetary_computer.sign(asset.href)
-                    band_hrefs.append(f"/vsicurl/{signed_href}")
-            if not band_hrefs:
-                self.vrt_error.emit("No valid band assets found")
-                return
-            result = processing.run("gdal:buildvirtualraster", {
-                'INPUT': band_hrefs, 'SEPARATE': True, 'OUTPUT': 'TEMPORARY_OUTPUT'
-            })
+            resolution = None
+            epsg = epsg_from_fields(self.item.properties)
+            if self.view is not None and epsg is not None:
+                resolution = view_resolution(epsg, *self.view)
+            io_profile.apply([a.href for a in self.item.assets.values()])
+            tokens   = shared_token_manager()
+            vrt_path = build_item_vrt(
+                self.item, self.bands, self.collection, tokens.sign,
+                resolution, self.overview, self.mask)
+            token.raise_if_cancelled()
             cloud_pct  = self.item.properties.get("eo:cloud_cover", 0)
             prefix     = "S2" if "sentinel" in self.collection else "LS"
+            if isinstance(self.bands, indices.SpectralIndex):
+                prefix = f"{prefix}_{self.bands.name}"
             layer_name = f"{prefix}_{self.item.id}_({cloud_pct:.1f}% Clouds)"
-            self.vrt_ready.emit(result['OUTPUT'], layer_name)
+            if self.reduced:
+                layer_name += REDUCED_SUFFIX
+            self.vrt_ready.emit(vrt_path, layer_name)
+        except TaskCancelled:
+            raise
         except Exception as e:
             self.vrt_error.emit(str(e))
 
 
+class MosaicWorker(QObject):
+    """Builds one mosaic VRT from the best item per footprint."""
+    vrt_ready = pyqtSignal(str, str)
+    vrt_error = pyqtSignal(str)
+
+    def __init__(self, items, bands, collection, bbox, view=None, overview=None, mask=None,
+                 parent=None):
+        super(MosaicWorker, self).__init__(parent)
+        self.items      = items
+        self.bands      = bands
+        self.collection = collection
+        self.bbox       = bbox
+        self.view       = view
+        self.overview   = overview
+        self.mask       = mask
+
+    @property
+    def reduced(self):
+        return self.view is not None or bool(self.overview)
+
+    def full_resolution(self):
+        return MosaicWorker(self.items, self.bands, self.collection, self.bbox, mask=self.mask)
+
+    def run(self, token):
+        try:
+            io_profile.apply([a.href for i in self.items for a in i.assets.values()])
+            tokens   = shared_token_manager()
+            width_px = self.view[1] if self.view is not None else None
+            vrt_path = build_mosaic_vrt(
+                self.items, self.bands, self.collection, tokens.sign, self.bbox,
+                width_px, self.overview, self.mask)
+            token.raise_if_cancelled()
+            prefix     = "S2" if "sentinel" in self.collection else "LS"
+            if isinstance(self.bands, indices.SpectralIndex):
+                prefix = f"{prefix}_{self.bands.name}"
+            dates      = sorted((i.properties.get("datetime") or "")[:10] for i in self.items)
+            date_range = dates[0] if dates[0] == dates[-1] else f"{dates[0]}_{dates[-1]}"
+            layer_name = f"{prefix}_mosaic_{date_range}_({len(self.items)} tiles)"
+            if self.reduced:
+                layer_name += REDUCED_SUFFIX
+            self.vrt_ready.emit(vrt_path, layer_name)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.vrt_error.emit(str(e))
+
+
+class ExportWorker(QObject):
+    """Exports the map-extent window of one item's composition to a local COG."""
+    progress     = pyqtSignal(int, int)
+    resuming     = pyqtSignal()
+    export_done  = pyqtSignal(str, str)
+    export_error = pyqtSignal(str)
+
+    def __init__(self, item, bands, collection, bbox, dst_path, mask=None, parent=None):
+        super(ExportWorker, self).__init__(parent)
+        self.item       = item
+        self.bands      = bands
+        self.collection = collection
+        self.bbox       = bbox
+        self.dst_path   = dst_path
+        self.mask       = mask
+
+    def run(self, token):
+        try:
+            io_profile.apply([a.href for a in self.item.assets.values()])
+            tokens   = shared_token_manager()
+            vrt_path = build_item_vrt(
+                self.item, self.bands, self.collection, tokens.sign, mask=self.mask)
+            exporter = WindowExporter(
+                vrt_path, self.dst_path, self.bbox,
+                workers=plugin_settings.value("export/workers"))
+            result = exporter.run(
+                progress=self.progress.emit, cancelled=lambda: token.cancelled,
+                resumed=self.resuming.emit)
+            if result is None:
+                raise TaskCancelled()
+            layer_name = os.path.splitext(os.path.basename(result))[0]
+            self.export_done.emit(result, layer_name)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.export_error.emit(str(e))
+
+
+class CompositeWorker(QObject):
+    """Computes a per-pixel temporal composite of several items into a local COG."""
+    progress     = pyqtSignal(int, int)
+    export_done  = pyqtSignal(str, str)
+    export_error = pyqtSignal(str)
+
+    def __init__(self, items, bands, collection, bbox, dst_path, statistic, mask=None,
+                 parent=None):
+        super(CompositeWorker, self).__init__(parent)
+        self.items      = items
+        self.bands      = bands
+        self.collection = collection
+        self.bbox       = bbox
+        self.dst_path   = dst_path
+        self.statistic  = statistic
+        self.mask       = mask
+
+    def run(self, token):
+        try:
+            io_profile.apply([a.href for item in self.items for a in item.assets.values()])
+            composite = TemporalComposite(
+                self.items, self.bands, self.collection, shared_token_manager().sign,
+                self.bbox, self.dst_path, self.statistic,
+                workers=plugin_settings.value("composite/workers"),
+                python=python_executable(), config=io_profile.profile_options(),
+                mask=self.mask)
+            result = composite.run(
+                progress=self.progress.emit, cancelled=lambda: token.cancelled)
+            if result is None:
+                raise TaskCancelled()
+            QgsMessageLog.logMessage(
+                f"Composite of {len(self.items)} images computed on "
+                f"{composite.workers} {composite.parallelism}",
+                "Quick VRT Imagery Loader", MsgLevel.Info)
+            layer_name = os.path.splitext(os.path.basename(result))[0]
+            self.export_done.emit(result, layer_name)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.export_error.emit(str(e))
+
+
+class ClearSkyWorker(QObject):
+    """Measures the clear-sky fraction over the map extent of a few results."""
+    progress    = pyqtSignal(int, int)
+    clear_ready = pyqtSignal(object, object)
+    clear_error = pyqtSignal(str)
+
+    def __init__(self, store, handles, mask, collection, bbox, parent=None):
+        super(ClearSkyWorker, self).__init__(parent)
+        self.store      = store
+        self.handles    = handles
+        self.mask       = mask
+        self.collection = collection
+        self.bbox       = bbox
+
+    def run(self, token):
+        try:
+            items = [self.store.item(h) for h in self.handles]
+            io_profile.apply(
+                [i.assets[self.mask.key].href for i in items if self.mask.key in i.assets])
+            fractions = clear_fractions(
+                items, self.mask, self.collection, shared_token_manager().sign, self.bbox,
+                workers=plugin_settings.value("rank/clear_workers"),
+                progress=self.progress.emit, cancelled=lambda: token.cancelled)
+            token.raise_if_cancelled()
+            self.clear_ready.emit(
+                self.store, {self.handles[i]: f for i, f in fractions.items()})
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.clear_error.emit(str(e))
+
+
+class BatchLoader(QObject):
+    """Builds VRTs for several items with at most ``max_parallel`` in flight.
+
+    Each finished layer is reported through ``item_loaded`` as soon as it is
+    ready; failures are collected and reported once in ``finished`` without
+    stopping the rest of the batch.
+    """
+    item_loaded = pyqtSignal(str, str, object)
+    progress    = pyqtSignal(int, int)
+    finished    = pyqtSignal(int, list)
+
+    def __init__(self, scheduler, items, bands, collection, max_parallel=4,
+                 view=None, overview=None, mask=None, parent=None):
+        super(BatchLoader, self).__init__(parent)
+        self.scheduler    = scheduler
+        self.queue        = list(items)
+        self.total        = len(self.queue)
+        self.bands        = bands
+        self.collection   = collection
+        self.view         = view
+        self.overview     = overview
+        self.mask         = mask
+        self.max_parallel = max(1, max_parallel)
+        self.errors       = []
+        self.cancelled    = False
+        self._done        = 0
+        self._in_flight   = {}
+
+    def start(self):
+        self.progress.emit(0, self.total)
+        self._submit_next()
+
+    def _submit_next(self):
+        while self.queue and len(self._in_flight) < self.max_parallel:
+            item   = self.queue.pop(0)
+            worker = VrtWorker(
+                item, self.bands, self.collection, self.view, self.overview, self.mask)
+            worker.vrt_ready.connect(
+                lambda path, name, w=worker: self._on_ready(w, path, name))
+            worker.vrt_error.connect(
+                lambda msg, w=worker: self._on_error(w, msg))
+            self._in_flight[worker] = self.scheduler.submit(worker, PRIORITY_LOAD)
+
+    def _finish_one(self, worker):
+        self._in_flight.pop(worker, None)
+        self._done += 1
+        self.progress.emit(self._done, self.total)
+        if self.queue:
+            self._submit_next()
+        elif not self._in_flight:
+            self.finished.emit(self._done - len(self.errors), self.errors)
+
+    def _on_ready(self, worker, vrt_path, layer_name):
+        if self.cancelled:
+            return
+        self.item_loaded.emit(vrt_path, layer_name, worker)
+        self._finish_one(worker)
+
+    def _on_error(self, worker, error_msg):
+        if self.cancelled:
+            return
+        self.errors.append((worker.item.id, error_msg))
+        self._finish_one(worker)
+
+    def cancel(self):
+        """Stop the batch; layers already added stay, nothing else is reported."""
+        self.cancelled = True
+        self.queue = []
+        for token in self._in_flight.values():
+            token.cancel()
+        self._in_flight.clear()
+
+
 class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
 
     def __init__(self, parent=None):
         super(SentinelSTACDialog, self).__init__(parent)
         self.setupUi(self)
-        self.loader         = SentinelSTACLoader()
-        self.last_items     = []
-        self._thumb_worker  = None
-        self._search_worker = None
-        self._vrt_worker    = None
+        self.loader          = SentinelSTACLoader()
+        self.results         = ResultsModel(self)
+        self._selected_id    = None
+        self._search_cache   = None
+        self._pending_query  = None
+        self._superset_query = None
+        self._superset_rows  = None
+        self._thumb_cache    = ThumbnailCache()
+        self._prefetcher     = ThumbnailPrefetcher(self._thumb_cache)
+        self._scheduler      = shared_scheduler()
+        self._jobs           = shared_job_scheduler()
+        self._thumb_worker   = None
+        self._search_worker  = None
+        self._loads          = set()
+        self._clear_worker   = None
+        self._batches        = {}  # BatchLoader -> its layer group, once it has one
+        self._exports        = set()
+        self._reduced_layers = {}
 
         self._retranslateUi()
 
         self.comboBox_satelite.currentIndexChanged.connect(self.atualizar_parametros_satelite)
-        self.tableWidget.cellClicked.connect(self.atualizar_indice_pelo_clique)
+        self.tableView.setModel(self.results)
+        header = self.tableView.horizontalHeader()
+        header.setResizeContentsPrecision(RESIZE_SAMPLE_ROWS)
+        header.setSortIndicator(*self.results.sort_indicator())
+        self.tableView.setSortingEnabled(True)
+        self.tableView.clicked.connect(self.atualizar_indice_pelo_clique)
+        self.results.layoutChanged.connect(self._restore_selection)
+        self.btn_carregar_selecionadas.clicked.connect(self.process_batch_selected)
+        self.btn_carregar_top.clicked.connect(self.process_batch_top)
+        self.btn_carregar_mosaico.clicked.connect(self.process_mosaic_load)
+        self.btn_exportar.clicked.connect(self.process_export)
+        self.btn_composite.clicked.connect(self.process_composite)
+        self.btn_rank_clear.clicked.connect(self.process_rank_clear)
+        self.btn_full_resolution.clicked.connect(self.process_full_resolution)
+        self.comboBox_resolution.currentIndexChanged.connect(self._on_resolution_changed)
+        QgsProject.instance().layersWillBeRemoved.connect(self._forget_layers)
         self.slider_clouds.valueChanged.connect(self._atualizar_label_clouds)
 
+        self.spinBox_max_results.setValue(plugin_settings.value("search/max_items"))
+        show_all = plugin_settings.value("search/show_duplicates")
+        self.results.deduplicate = not show_all
+        self.checkBox_show_all.setChecked(show_all)
+        self.checkBox_show_all.toggled.connect(self._on_show_all_toggled)
+        self.checkBox_mask_clouds.setChecked(plugin_settings.value("mask/enabled"))
+        self.checkBox_mask_clouds.toggled.connect(
+            lambda checked: plugin_settings.set_value("mask/enabled", checked))
+        profile = plugin_settings.value("io/profile")
+        if profile in io_profile.profile_names():
+            self.comboBox_io_profile.setCurrentIndex(io_profile.profile_names().index(profile))
+        # Connected after restoring the saved profile, so "Custom" does not
+        # open its editor every time the dialog is built.
+        self.comboBox_io_profile.currentIndexChanged.connect(self._on_io_profile_changed)
+        self.btn_io_edit.clicked.connect(self._edit_io_profile)
+        resolution = plugin_settings.value("load/resolution")
+        if resolution in RESOLUTION_MODES:
+            self.comboBox_resolution.setCurrentIndex(RESOLUTION_MODES.index(resolution))
+
         self.atualizar_parametros_satelite()
         self._reset_thumbnail_panel()
 
@@ -240,6 +693,27 @@ class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
             self.tr("Filter images by maximum cloud cover percentage")
         )
 
+        # Max results label
+        self.label_max_results.setText(
+            '<html><head/><body><p>'
+            '<span style=" font-size:10pt; font-weight:600;">'
+            + self.tr("Max results:") +
+            '</span></p></body></html>'
+        )
+
+        # Max results tooltip
+        self.spinBox_max_results.setToolTip(
+            self.tr("Maximum number of images returned by a search")
+        )
+        self.spinBox_max_results.setSpecialValueText(self.tr("Unlimited"))
+
+        # Duplicates toggle
+        self.checkBox_show_all.setText(self.tr("Show duplicates"))
+        self.checkBox_show_all.setToolTip(
+            self.tr("Also list older or cloudier copies of the same acquisition "
+                    "(same platform, tile and time), e.g. reprocessed items")
+        )
+
         # List button
         self.btn_listar.setText(self.tr("List available images"))
 
@@ -252,10 +726,11 @@ class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
         )
 
         # Table column headers
-        self.tableWidget.horizontalHeaderItem(0).setText(self.tr("Index"))
-        self.tableWidget.horizontalHeaderItem(1).setText(self.tr("Image date"))
-        self.tableWidget.horizontalHeaderItem(2).setText(self.tr("Clouds (%)"))
-        self.tableWidget.horizontalHeaderItem(3).setText(self.tr("ID"))
+        self.results.set_headers([
+            self.tr("Index"), self.tr("Image date"), self.tr("Clouds (%)"),
+            self.tr("Coverage (%)"), self.tr("AOI clear (%)"), self.tr("Score"),
+            self.tr("ID"),
+        ])
 
         # Section header — PREVIEW
         self.label_section_results_2.setText(
@@ -298,13 +773,92 @@ class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
         self.label_hint.setText(
             '<html><head/><body><p>'
             '<span style=" color:#888888; font-size:8pt; font-style:italic;">'
-            + self.tr("Sorted by cloud cover, lowest to highest. Click a row to preview.") +
+            + self.tr("Ranked by score (map coverage × clear sky). Click a row to preview.") +
+            '</span></p></body></html>'
+        )
+
+        # I/O profile label, entries and tooltip
+        self.label_io_profile.setText(
+            '<html><head/><body><p>'
+            '<span style=" font-size:10pt; font-weight:600;">'
+            + self.tr("Network:") +
             '</span></p></body></html>'
         )
+        self.comboBox_io_profile.setItemText(0, self.tr("Conservative"))
+        self.comboBox_io_profile.setItemText(1, self.tr("Aggressive"))
+        self.comboBox_io_profile.setItemText(2, self.tr("Custom"))
+        self.comboBox_io_profile.setToolTip(
+            self.tr("GDAL network settings applied to the loaded layers")
+        )
+        self.btn_io_edit.setText(self.tr("Edit…"))
+        self.btn_io_edit.setToolTip(self.tr("Edit the custom network profile"))
 
         # Load button
         self.btn_carregar.setText(self.tr("Load image"))
 
+        # Batch loading
+        self.label_batch.setText(
+            '<html><head/><body><p>'
+            '<span style=" font-size:10pt; font-weight:600;">'
+            + self.tr("Batch:") +
+            '</span></p></body></html>'
+        )
+        self.spinBox_top_n.setToolTip(
+            self.tr("Number of images, from the top of the list, loaded by \"Load top N\"")
+        )
+        self.btn_carregar_top.setText(self.tr("Load top N"))
+        self.btn_carregar_selecionadas.setText(self.tr("Load selected"))
+        self.btn_carregar_mosaico.setText(self.tr("Load mosaic"))
+        self.btn_exportar.setText(self.tr("Export map extent…"))
+        self.label_resolution.setText(
+            '<html><head/><body><p>'
+            '<span style=" font-size:10pt; font-weight:600;">'
+            + self.tr("Resolution:") +
+            '</span></p></body></html>'
+        )
+        self.comboBox_resolution.setItemText(0, self.tr("Full resolution"))
+        self.comboBox_resolution.setItemText(1, self.tr("Match map scale"))
+        self.comboBox_resolution.setItemText(2, self.tr("Overview 1 (1/2)"))
+        self.comboBox_resolution.setItemText(3, self.tr("Overview 2 (1/4)"))
+        self.comboBox_resolution.setItemText(4, self.tr("Overview 3 (1/8)"))
+        self.comboBox_resolution.setItemText(5, self.tr("Overview 4 (1/16)"))
+        self.comboBox_resolution.setToolTip(
+            self.tr("Reduced resolutions read the images' overviews: much faster "
+                    "for regional views")
+        )
+        self.btn_full_resolution.setText(self.tr("Full resolution"))
+        self.btn_full_resolution.setToolTip(
+            self.tr("Rebuild the active layer, loaded at reduced resolution, at "
+                    "full resolution")
+        )
+        self.btn_exportar.setToolTip(
+            self.tr("Save the chosen image, clipped to the map extent, as a local "
+                    "Cloud Optimized GeoTIFF")
+        )
+        self.checkBox_mask_clouds.setText(self.tr("Mask clouds and shadows"))
+        self.checkBox_mask_clouds.setToolTip(
+            self.tr("Hide cloud, cirrus and shadow pixels using the Sentinel-2 scene "
+                    "classification (SCL) or Landsat QA_PIXEL band")
+        )
+        self.btn_rank_clear.setText(self.tr("Rank by clear sky"))
+        self.btn_rank_clear.setToolTip(
+            self.tr("Measure how clear the map extent is in the top results, from a "
+                    "low-resolution read of their SCL / QA_PIXEL band, and rank by it")
+        )
+        self.btn_composite.setText(self.tr("Temporal composite…"))
+        self.btn_composite.setToolTip(
+            self.tr("Per-pixel median (or percentile) of the selected images, or of "
+                    "the top N, over the map extent, saved as a local Cloud Optimized "
+                    "GeoTIFF")
+        )
+        self.btn_carregar_mosaico.setToolTip(
+            self.tr("One layer with the least cloudy image of every tile in the map "
+                    "extent, from the selected row's acquisition if a row is selected")
+        )
+        self.btn_carregar_selecionadas.setToolTip(
+            self.tr("Load every selected row (Ctrl/Shift+click to select several)")
+        )
+
     # compositions
 
     def atualizar_parametros_satelite(self):
@@ -347,86 +901,261 @@ class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
             "Snow / Ice (R, G, NIR)":                         ['red',    'green',  'nir08'],
         }
 
+        # Index compositions are computed on the fly (see indices.py).
+        rgb_count = len(self.loader.compositions)
+        self.loader.compositions.update(indices.compositions(self.loader.collection))
+
         self.comboBox_composicao.clear()
         self.comboBox_composicao.addItems(list(self.loader.compositions.keys()))
+        if len(self.loader.compositions) > rgb_count:
+            self.comboBox_composicao.insertSeparator(rgb_count)
+
+    def _on_io_profile_changed(self, index):
+        name = io_profile.profile_names()[index]
+        plugin_settings.set_value("io/profile", name)
+        if name == "custom":
+            self._edit_io_profile()
+        io_profile.refresh()
+
+    def _edit_io_profile(self):
+        """Edit the custom options and switch to the custom profile."""
+        text, ok = QtWidgets.QInputDialog.getMultiLineText(
+            self, self.tr("Custom network profile"),
+            self.tr("GDAL configuration options, one KEY=VALUE per line:"),
+            plugin_settings.value("io/custom_options").replace(";", "\n"))
+        if not ok:
+            return
+        plugin_settings.set_value("io/custom_options", text)
+        custom = io_profile.profile_names().index("custom")
+        if self.comboBox_io_profile.currentIndex() != custom:
+            self.comboBox_io_profile.blockSignals(True)
+            self.comboBox_io_profile.setCurrentIndex(custom)
+            self.comboBox_io_profile.blockSignals(False)
+            plugin_settings.set_value("io/profile", "custom")
+        io_profile.refresh()
+
+    def _on_resolution_changed(self, index):
+        plugin_settings.set_value("load/resolution", RESOLUTION_MODES[index])
+
+    def _reduction(self):
+        """``(view, overview)`` for the resolution chosen in the dialog."""
+        mode = RESOLUTION_MODES[self.comboBox_resolution.currentIndex()]
+        if mode == "view":
+            return (self.loader.get_canvas_bbox(), self.loader.get_canvas_width()), None
+        if mode == "full":
+            return None, None
+        return None, int(mode)
+
+    def _cloud_mask(self):
+        """``CloudMask`` for the current collection when masking is on, else None."""
+        if not self.checkBox_mask_clouds.isChecked():
+            return None
+        return self._configured_mask()
+
+    def _configured_mask(self):
+        return cloud_mask.cloud_mask(
+            self.loader.collection,
+            cloud_mask.parse_values(plugin_settings.value("mask/scl_classes")),
+            cloud_mask.parse_values(plugin_settings.value("mask/qa_bits")))
+
+    def _on_show_all_toggled(self, checked):
+        plugin_settings.set_value("search/show_duplicates", checked)
+        self.results.set_deduplicate(not checked)
+        self._restore_selection()
 
     def _atualizar_label_clouds(self, value):
         self.label_clouds_value.setText(f"{value}%")
 
     def _set_ui_busy(self, busy, context="search"):
-        self.btn_listar.setEnabled(not busy)
-        self.btn_carregar.setEnabled(not busy)
+        # A running search only locks the search button, so rows that have
+        # already arrived can be previewed and loaded meanwhile.
         if context == "search":
+            self.btn_listar.setEnabled(not busy)
             self.btn_listar.setText(
                 self.tr("Searching…") if busy else self.tr("List available images")
             )
+        elif context == "clear":
+            self.btn_rank_clear.setEnabled(not busy)
         elif context == "load":
+            self.btn_carregar.setEnabled(not busy)
             self.btn_carregar.setText(
                 self.tr("Loading…") if busy else self.tr("Load image")
             )
 
-    def atualizar_indice_pelo_clique(self, row, column):
-        self.spinBox_indice.setValue(row)
-        self._carregar_thumbnail(row)
+    def atualizar_indice_pelo_clique(self, index):
+        self.spinBox_indice.setValue(index.row())
+        self._carregar_thumbnail(index.row())
 
 
     def _carregar_thumbnail(self, row):
-        if row < 0 or row >= len(self.last_items): return
-        item = self.last_items[row]
-        self.lbl_thumb_date.setText(item.properties.get("datetime", "N/A")[:10])
-        self.lbl_thumb_clouds.setText(f"☁ {item.properties.get('eo:cloud_cover', 0):.1f}%")
-        self.lbl_thumb_id.setText(item.id)
-
-        asset = item.assets.get('rendered_preview')
-        if not asset:
+        result = self.results.row(row)
+        if result is None: return
+        self._selected_id = result.id
+        self.lbl_thumb_date.setText(result.date or "N/A")
+        self.lbl_thumb_clouds.setText(
+            "☁ N/A" if math.isnan(result.cloud) else f"☁ {result.cloud:.1f}%")
+        self.lbl_thumb_id.setText(result.id)
+
+        neighbours = plugin_settings.value("prefetch/neighbours")
+        self._prefetch_rows(range(row - neighbours, row + neighbours + 1))
+
+        if not result.preview:
             self.lbl_thumbnail.setText(self.tr("No preview available"))
             return
 
+        # Revisited rows are served straight from memory, no thread needed.
+        image = self._thumb_cache.get_memory(result.id, result.preview)
+        if image is not None:
+            self._exibir_thumbnail(result.id, image)
+            return
+
         self.lbl_thumbnail.setText(self.tr("Loading…"))
-        if self._thumb_worker and self._thumb_worker.isRunning():
-            self._thumb_worker.terminate()
-            self._thumb_worker.wait()
-        self._thumb_worker = ThumbnailWorker(asset.href, parent=self)
+        # Submitting to the "thumbnail" group cancels the previous request.
+        self._thumb_worker = ThumbnailWorker(result.id, result.preview, self._thumb_cache)
         self._thumb_worker.thumbnail_ready.connect(self._exibir_thumbnail)
-        self._thumb_worker.start()
-
-    def _exibir_thumbnail(self, pixmap):
+        self._thumb_worker.failed.connect(self._on_thumbnail_failed)
+        self._scheduler.submit(self._thumb_worker, PRIORITY_THUMBNAIL, group="thumbnail")
+
+    def _prefetch_rows(self, rows):
+        requests = []
+        for row in rows:
+            result = self.results.row(row)
+            if result is not None and result.preview:
+                requests.append((result.id, result.preview))
+        self._prefetcher.prefetch(requests)
+
+    def _exibir_thumbnail(self, item_id, image):
+        if item_id != self._selected_id:
+            return
         self.lbl_thumbnail.setText("")
-        self.lbl_thumbnail.setPixmap(pixmap)
+        self.lbl_thumbnail.setPixmap(QPixmap.fromImage(image))
+
+    def _on_thumbnail_failed(self, item_id, error_msg):
+        if item_id != self._selected_id:
+            return
+        self.lbl_thumbnail.setText(self.tr("No preview available"))
 
     def popular_tabela(self):
         data_inicio = self.dateEdit_inicio.date().toString("yyyy-MM-dd")
         data_final  = self.dateEdit_final.date().toString("yyyy-MM-dd")
         bbox        = self.loader.get_canvas_bbox()
+        max_items   = self.spinBox_max_results.value()
+        plugin_settings.set_value("search/max_items", max_items)
+        query = SearchQuery(
+            self.loader.collection, tuple(bbox), data_inicio, data_final,
+            self.slider_clouds.value())
+
+        self._selected_id = None
+        self.results.max_rows = max_items
+        self.results.clear()
+        self._reset_thumbnail_panel()
+        self._prefetcher.cancel()
+        # Fractions measured over the old extent must not re-rank the new
+        # rows, which may live in the same superset store.
+        self._cancel_clear()
+
+        # A narrower query than the last complete search (lower cloud limit,
+        # shorter date range, smaller extent) is answered from memory.
+        if self._superset_query is not None and self._superset_query.contains(query):
+            store, handles = self._superset_rows
+            self.results.show(
+                store, [h for h in handles if query.matches(store.row(h))], query.bbox)
+            iface.mainWindow().statusBar().clearMessage()
+            self.tableView.resizeColumnsToContents()
+            self._prefetch_rows(range(plugin_settings.value("prefetch/top_n")))
+            return
+
         self._set_ui_busy(True, "search")
         iface.mainWindow().statusBar().showMessage(
             self.tr("Searching images on Planetary Computer STAC API…")
         )
+        self._pending_query = query
         self._search_worker = SearchWorker(
-            self.loader.catalog_url, self.loader.collection,
-            bbox, data_inicio, data_final, self.slider_clouds.value(),
-            parent=self
+            self.loader.catalog_url, query.collection,
+            bbox, data_inicio, data_final, query.max_clouds,
+            max_items=max_items, cache=self._get_search_cache()
         )
+        self._search_worker.items_found.connect(self._on_items_found)
         self._search_worker.search_done.connect(self._on_search_done)
         self._search_worker.search_error.connect(self._on_search_error)
-        self._search_worker.start()
+        self._scheduler.submit(self._search_worker, PRIORITY_SEARCH, group="search")
+
+    def _get_search_cache(self):
+        """Open the on-disk search cache on first use; None when disabled."""
+        if not plugin_settings.value("cache/search_enabled"):
+            return None
+        if self._search_cache is None:
+            try:
+                self._search_cache = SearchCache()
+            except Exception as e:
+                QgsMessageLog.logMessage(
+                    f"Search cache unavailable: {e}",
+                    "Quick VRT Imagery Loader", MsgLevel.Warning)
+                return None
+        return self._search_cache
+
+    def _is_current_search(self):
+        """False for signals still queued from a search that was cancelled."""
+        return self.sender() is self._search_worker
+
+    def _on_items_found(self, items):
+        if self._is_current_search():
+            self._append_results(items)
+
+    def _append_results(self, items):
+        """Merge a page of results into the table, keeping the current sort."""
+        first_page = self.results.rowCount() == 0
+        self.results.append(items)
+        if first_page:
+            self.tableView.resizeColumnsToContents()
+        self._restore_selection()
+
+        iface.mainWindow().statusBar().showMessage(
+            self.tr("Searching images on Planetary Computer STAC API…")
+            + f" ({self.results.rowCount()})"
+        )
+
+    def _restore_selection(self):
+        """Keep the previewed item current while rows shift it around.
 
-    def _on_search_done(self, items):
+        Inserts and sorts carry the selection along with its rows, so a
+        Ctrl/Shift multi-selection is left alone; the previewed row is only
+        selected again when a model reset has cleared the selection.
+        """
+        if self._selected_id is None:
+            return
+        row = self.results.row_of(self._selected_id)
+        if row is None:
+            return
+        self.spinBox_indice.setValue(row)
+        selection = self.tableView.selectionModel()
+        if selection.hasSelection():
+            selection.setCurrentIndex(self.results.index(row, 0), _NO_UPDATE)
+        else:
+            self.tableView.selectRow(row)
+
+    def _on_search_done(self, total, complete):
+        if not self._is_current_search():
+            return
+        self._search_worker = None
         self._set_ui_busy(False, "search")
         iface.mainWindow().statusBar().clearMessage()
-        self.last_items = items
-        self.tableWidget.setRowCount(0)
-        for idx, item in enumerate(items):
-            self.tableWidget.insertRow(idx)
-            self.tableWidget.setItem(idx, 0, QtWidgets.QTableWidgetItem(str(idx)))
-            self.tableWidget.setItem(idx, 1, QtWidgets.QTableWidgetItem(
-                item.properties.get("datetime", "N/A")[:10]))
-            self.tableWidget.setItem(idx, 2, QtWidgets.QTableWidgetItem(
-                f"{item.properties.get('eo:cloud_cover', 0):.2f}%"))
-            self.tableWidget.setItem(idx, 3, QtWidgets.QTableWidgetItem(item.id))
-        self.tableWidget.resizeColumnsToContents()
+        hidden = self.results.hidden_count()
+        if hidden:
+            iface.mainWindow().statusBar().showMessage(
+                self.tr("{} duplicate images hidden").format(hidden), 5000)
+        self.tableView.resizeColumnsToContents()
+        self._prefetch_rows(range(plugin_settings.value("prefetch/top_n")))
+        # Results cut by the cap are not a full superset of the query. The
+        # row count cannot tell: hidden duplicates lower it.
+        if complete:
+            self._superset_query = self._pending_query
+            self._superset_rows  = (self.results.store, self.results.all_handles())
 
     def _on_search_error(self, error_msg):
+        if not self._is_current_search():
+            return
+        self._search_worker = None
         self._set_ui_busy(False, "search")
         iface.mainWindow().statusBar().clearMessage()
         iface.messageBar().pushMessage(
@@ -434,32 +1163,385 @@ class SentinelSTACDialog(QtWidgets.QDialog, FORM_CLASS):
             level=MsgLevel.Critical, duration=8
         )
 
+    def process_rank_clear(self):
+        """Re-rank the top results by their clear sky over the map extent."""
+        handles = self.results.handles()[:plugin_settings.value("rank/clear_top_n")]
+        mask = self._configured_mask()
+        if not handles or mask is None:
+            return
+        self._set_ui_busy(True, "clear")
+        self._clear_worker = ClearSkyWorker(
+            self.results.store, handles, mask, self.loader.collection,
+            self.loader.get_canvas_bbox())
+        self._clear_worker.progress.connect(self._on_clear_progress)
+        self._clear_worker.clear_ready.connect(self._on_clear_ready)
+        self._clear_worker.clear_error.connect(self._on_clear_error)
+        self._scheduler.submit(self._clear_worker, PRIORITY_SEARCH, group="clear")
+
+    def _cancel_clear(self):
+        if self._clear_worker is not None:
+            self._scheduler.cancel("clear")
+            self._clear_worker = None
+            self._set_ui_busy(False, "clear")
+
+    def _is_current_clear(self):
+        return self.sender() is self._clear_worker
+
+    def _on_clear_progress(self, done, total):
+        if self._is_current_clear():
+            iface.mainWindow().statusBar().showMessage(
+                self.tr("Measuring clear sky over the map extent…")
+                + f" ({done}/{total})")
+
+    def _on_clear_ready(self, store, fractions):
+        if not self._is_current_clear():
+            return
+        self._clear_worker = None
+        self._set_ui_busy(False, "clear")
+        self.results.set_aoi_clear(store, fractions)
+        self.tableView.resizeColumnsToContents()
+        measured = sum(1 for f in fractions.values() if not math.isnan(f))
+        iface.mainWindow().statusBar().showMessage(
+            self.tr("Clear sky measured over the map extent for {} images").format(measured),
+            5000)
+
+    def _on_clear_error(self, error_msg):
+        if not self._is_current_clear():
+            return
+        self._clear_worker = None
+        self._set_ui_busy(False, "clear")
+        iface.mainWindow().statusBar().clearMessage()
+        iface.messageBar().pushMessage(
+            self.tr("Clear sky error"), error_msg,
+            level=MsgLevel.Critical, duration=8)
+
     def process_stac_load(self):
-        if not self.last_items: return
-        indice = self.spinBox_indice.value()
-        selected_item = self.last_items[indice]
+        selected_item = self.results.item(self.spinBox_indice.value())
+        if selected_item is None: return
         bands = self.loader.compositions.get(self.comboBox_composicao.currentText(), [])
+        view, overview = self._reduction()
+        self._start_load(
+            VrtWorker(selected_item, bands, self.loader.collection, view, overview,
+                      self._cloud_mask()),
+            self._on_vrt_ready)
+
+    def _start_load(self, worker, on_ready):
+        """Run a single-layer load; ``on_ready(worker, path, name)`` gets its
+        result. The load button stays busy until every load has finished."""
+        self._loads.add(worker)
         self._set_ui_busy(True, "load")
-        self._vrt_worker = VrtWorker(
-            selected_item, bands, self.loader.collection, parent=self
-        )
-        self._vrt_worker.vrt_ready.connect(self._on_vrt_ready)
-        self._vrt_worker.vrt_error.connect(self._on_vrt_error)
-        self._vrt_worker.start()
+        worker.vrt_ready.connect(lambda path, name, w=worker: on_ready(w, path, name))
+        worker.vrt_error.connect(lambda msg, w=worker: self._on_vrt_error(w, msg))
+        self._scheduler.submit(worker, PRIORITY_LOAD)
+
+    def _finish_load(self, worker):
+        self._loads.discard(worker)
+        if not self._loads:
+            self._set_ui_busy(False, "load")
 
-    def _on_vrt_ready(self, vrt_path, layer_name):
-        self._set_ui_busy(False, "load")
+    def _on_vrt_ready(self, worker, vrt_path, layer_name):
+        self._finish_load(worker)
         vrt_layer = QgsRasterLayer(vrt_path, layer_name)
         if vrt_layer.isValid():
             QgsProject.instance().addMapLayer(vrt_layer)
+            self._track_reduced(vrt_layer, worker)
+
+    def _track_reduced(self, layer, worker):
+        if worker is not None and worker.reduced:
+            self._reduced_layers[layer.id()] = worker.full_resolution
+
+    def _forget_layers(self, layer_ids):
+        for layer_id in layer_ids:
+            self._reduced_layers.pop(layer_id, None)
+
+    def process_full_resolution(self):
+        """Rebuild the active layer, loaded at reduced resolution, at full
+        resolution in place, keeping its style and position in the tree."""
+        layer   = iface.activeLayer()
+        factory = self._reduced_layers.get(layer.id()) if layer is not None else None
+        if factory is None:
+            iface.messageBar().pushMessage(
+                self.tr("Full resolution"),
+                self.tr("Select a layer that was loaded at reduced resolution."),
+                level=MsgLevel.Info, duration=5)
+            return
+        layer_id = layer.id()
+        self._start_load(
+            factory(),
+            lambda worker, path, name: self._on_full_resolution_ready(
+                layer_id, worker, path, name))
+
+    def _on_full_resolution_ready(self, layer_id, worker, vrt_path, layer_name):
+        self._finish_load(worker)
+        self._reduced_layers.pop(layer_id, None)
+        layer = QgsProject.instance().mapLayer(layer_id)
+        if layer is None:
+            self._on_vrt_ready(worker, vrt_path, layer_name)
+            return
+        layer.setDataSource(vrt_path, layer_name, "gdal")
+        layer.triggerRepaint()
+
+    def process_mosaic_load(self):
+        """Mosaic the canvas extent: best item per tile, taken from the
+        acquisition of the selected row when there is one."""
+        if not self.results.rowCount():
+            return
+        rows = self._selected_rows()
+        reference = self.results.row(rows[0]) if rows else None
+        chosen = select_items(
+            self.results.rows(), reference,
+            footprint=attrgetter("tile"), acquisition=attrgetter("acquisition"),
+            cloud=lambda r: 100.0 if math.isnan(r.cloud) else r.cloud)
+        items = [self.results.store.item(r.handle) for r in chosen]
+        bands = self.loader.compositions.get(self.comboBox_composicao.currentText(), [])
+        view, overview = self._reduction()
+        self._start_load(
+            MosaicWorker(items, bands, self.loader.collection, self.loader.get_canvas_bbox(),
+                         view, overview, self._cloud_mask()),
+            self._on_vrt_ready)
+
+    def process_export(self):
+        """Export the selected image's composition, clipped to the map extent."""
+        item = self.results.item(self.spinBox_indice.value())
+        if item is None:
+            return
+        bands = self.loader.compositions.get(self.comboBox_composicao.currentText(), [])
+        dst_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, self.tr("Export map extent"),
+            os.path.join(os.path.expanduser("~"), f"{item.id}.tif"),
+            self.tr("GeoTIFF (*.tif *.tiff)"))
+        if not dst_path:
+            return
+
+        worker = ExportWorker(
+            item, bands, self.loader.collection, self.loader.get_canvas_bbox(), dst_path,
+            self._cloud_mask())
+        # Only reported once the exporter has checked the sidecar matches.
+        worker.resuming.connect(lambda: iface.messageBar().pushMessage(
+            self.tr("Export"), self.tr("Resuming an interrupted export."),
+            level=MsgLevel.Info, duration=4))
+        self._start_export(
+            worker, self.tr("Exporting"), os.path.basename(dst_path),
+            self.tr("Export cancelled. Export to the same file again to resume."))
+
+    def process_composite(self):
+        """Per-pixel temporal composite of the selected rows (or the top N)
+        over the map extent."""
+        rows = self._selected_rows()
+        if len(rows) > 1:
+            items = [self.results.item(r) for r in rows]
+        else:
+            items = self.results.items(self.spinBox_top_n.value())
+        if len(items) < 2:
+            iface.messageBar().pushMessage(
+                self.tr("Composite"), self.tr("A composite needs at least two images."),
+                level=MsgLevel.Warning, duration=5)
+            return
+        labels = {
+            "median": self.tr("Median"),
+            "p10":    self.tr("10th percentile"),
+            "p25":    self.tr("25th percentile"),
+            "p75":    self.tr("75th percentile"),
+            "p90":    self.tr("90th percentile"),
+        }
+        statistics = list(labels)
+        current = plugin_settings.value("composite/statistic")
+        label, ok = QtWidgets.QInputDialog.getItem(
+            self, self.tr("Temporal composite"),
+            self.tr("Per-pixel statistic of {} images:").format(len(items)),
+            list(labels.values()),
+            statistics.index(current) if current in statistics else 0, False)
+        if not ok:
+            return
+        statistic = statistics[list(labels.values()).index(label)]
+        plugin_settings.set_value("composite/statistic", statistic)
+
+        composition = self.comboBox_composicao.currentText()
+        bands = self.loader.compositions.get(composition, [])
+        prefix = "S2" if "sentinel" in self.loader.collection else "LS"
+        name = f"{prefix}_{getattr(bands, 'name', 'composite')}_{statistic}_{len(items)}"
+        dst_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, self.tr("Temporal composite"),
+            os.path.join(os.path.expanduser("~"), f"{name}.tif"),
+            self.tr("GeoTIFF (*.tif *.tiff)"))
+        if not dst_path:
+            return
+        worker = CompositeWorker(
+            items, bands, self.loader.collection, self.loader.get_canvas_bbox(),
+            dst_path, statistic, self._cloud_mask())
+        self._start_export(
+            worker, self.tr("Compositing"), os.path.basename(dst_path),
+            self.tr("Composite cancelled."))
+
+    def _start_export(self, worker, title, text, cancelled_text):
+        """Run an export-like ``worker`` with progress and Cancel in the message bar."""
+        progress_bar = QtWidgets.QProgressBar()
+        cancel_btn   = QtWidgets.QPushButton(self.tr("Cancel"))
+        message = iface.messageBar().createMessage(title, text)
+        message.layout().addWidget(progress_bar)
+        message.layout().addWidget(cancel_btn)
+        iface.messageBar().pushWidget(message, MsgLevel.Info)
+
+        worker.progress.connect(
+            lambda done, total: self._update_export_progress(progress_bar, done, total))
+        worker.export_done.connect(
+            lambda path, name: self._on_export_done(worker, message, path, name))
+        worker.export_error.connect(
+            lambda msg: self._on_export_error(worker, message, msg))
+        token = self._jobs.submit(worker, PRIORITY_LOAD)
+        cancel_btn.clicked.connect(
+            lambda: self._cancel_export(worker, message, token, cancelled_text))
+        self._exports.add(worker)
+
+    @staticmethod
+    def _update_export_progress(progress_bar, done, total):
+        try:
+            progress_bar.setMaximum(total)
+            progress_bar.setValue(done)
+        except RuntimeError:
+            pass
+
+    def _close_export(self, worker, message):
+        self._exports.discard(worker)
+        try:
+            iface.messageBar().popWidget(message)
+        except RuntimeError:
+            pass
+
+    def _cancel_export(self, worker, message, token, text):
+        token.cancel()
+        self._close_export(worker, message)
+        iface.messageBar().pushMessage(
+            self.tr("Export"), text, level=MsgLevel.Info, duration=6)
+
+    def _on_export_done(self, worker, message, path, layer_name):
+        self._close_export(worker, message)
+        layer = QgsRasterLayer(path, layer_name)
+        if layer.isValid():
+            QgsProject.instance().addMapLayer(layer)
+
+    def _on_export_error(self, worker, message, error_msg):
+        self._close_export(worker, message)
+        iface.messageBar().pushMessage(
+            self.tr("Export error"), error_msg,
+            level=MsgLevel.Critical, duration=8)
+
+    def _selected_rows(self):
+        rows = {index.row() for index in self.tableView.selectionModel().selectedRows()}
+        return sorted(r for r in rows if r < self.results.rowCount())
+
+    def process_batch_selected(self):
+        rows = self._selected_rows()
+        if rows:
+            self._start_batch([self.results.item(r) for r in rows])
+
+    def process_batch_top(self):
+        self._start_batch(self.results.items(self.spinBox_top_n.value()))
+
+    def _start_batch(self, items):
+        if not items:
+            return
+        composition = self.comboBox_composicao.currentText()
+        bands = self.loader.compositions.get(composition, [])
+        prefix = "S2" if "sentinel" in self.loader.collection else "LS"
+        group_name = f"{prefix} {composition} ({len(items)})"
+
+        progress_bar = QtWidgets.QProgressBar()
+        progress_bar.setMaximum(len(items))
+        cancel_btn   = QtWidgets.QPushButton(self.tr("Cancel"))
+        message = iface.messageBar().createMessage(self.tr("Loading images"), "")
+        message.layout().addWidget(progress_bar)
+        message.layout().addWidget(cancel_btn)
+        iface.messageBar().pushWidget(message, MsgLevel.Info)
+
+        view, overview = self._reduction()
+        batch = BatchLoader(
+            self._scheduler, items, bands, self.loader.collection,
+            max_parallel=plugin_settings.value("load/max_parallel"),
+            view=view, overview=overview, mask=self._cloud_mask(), parent=self)
+        batch.item_loaded.connect(
+            lambda path, name, worker: self._add_batch_layer(batch, group_name, path, name, worker))
+        batch.progress.connect(
+            lambda done, total: self._update_batch_progress(progress_bar, done))
+        batch.finished.connect(
+            lambda loaded, errors: self._on_batch_finished(batch, message, loaded, errors))
+        cancel_btn.clicked.connect(lambda: self._cancel_batch(batch, message))
+        self._batches[batch] = None
+        batch.start()
+
+    @staticmethod
+    def _update_batch_progress(progress_bar, done):
+        try:
+            progress_bar.setValue(done)
+        except RuntimeError:
+            # The user dismissed the message bar item; the batch carries on.
+            pass
+
+    def _add_batch_layer(self, batch, group_name, vrt_path, layer_name, worker):
+        vrt_layer = QgsRasterLayer(vrt_path, layer_name)
+        if vrt_layer.isValid():
+            # The group is created with the first layer, so a batch where
+            # every image fails leaves nothing behind.
+            group = self._batches.get(batch)
+            if group is None:
+                group = QgsProject.instance().layerTreeRoot().insertGroup(0, group_name)
+                self._batches[batch] = group
+            QgsProject.instance().addMapLayer(vrt_layer, False)
+            group.addLayer(vrt_layer)
+            self._track_reduced(vrt_layer, worker)
+
+    def _close_batch(self, batch, message):
+        self._batches.pop(batch, None)
+        try:
+            iface.messageBar().popWidget(message)
+        except RuntimeError:
+            pass
 
-    def _on_vrt_error(self, error_msg):
-        self._set_ui_busy(False, "load")
+    def _cancel_batch(self, batch, message):
+        batch.cancel()
+        self._close_batch(batch, message)
+        iface.messageBar().pushMessage(
+            self.tr("Loading images"), self.tr("Batch loading cancelled."),
+            level=MsgLevel.Info, duration=6)
+
+    def _on_batch_finished(self, batch, message, loaded, errors):
+        self._close_batch(batch, message)
+        for item_id, error_msg in errors:
+            QgsMessageLog.logMessage(
+                f"Could not load {item_id}: {error_msg}",
+                "Quick VRT Imagery Loader", MsgLevel.Warning)
+        if errors:
+            iface.messageBar().pushMessage(
+                self.tr("Load error"),
+                self.tr("{} of {} images could not be loaded, see the log for details.")
+                .format(len(errors), loaded + len(errors)),
+                level=MsgLevel.Warning, duration=8
+            )
+
+    def _on_vrt_error(self, worker, error_msg):
+        self._finish_load(worker)
         iface.messageBar().pushMessage(
             self.tr("Load error"), error_msg,
             level=MsgLevel.Critical, duration=8
         )
 
+    def done(self, result):
+        # Covers accept, reject and the window close button alike. Layer
+        # loads already started are left to finish.
+        self._prefetcher.cancel()
+        self._scheduler.cancel("thumbnail")
+        self._cancel_clear()
+        if self._search_worker is not None:
+            self._scheduler.cancel("search")
+            self._search_worker = None
+            self._set_ui_busy(False, "search")
+            iface.mainWindow().statusBar().clearMessage()
+        super(SentinelSTACDialog, self).done(result)
+
+    def shutdown(self):
+        """Stop the prefetch threads; called when the plugin is unloaded."""
+        self._prefetcher.shutdown()
+
     def _reset_thumbnail_panel(self):
         self.lbl_thumbnail.setText(self.tr("Select an image to preview"))
         self.lbl_thumbnail.setPixmap(QPixmap())
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Process-wide STAC client and pooled HTTP session.
+
+Opening a ``pystac_client.Client`` fetches the catalog's landing page and
+conformance classes, and every new ``requests`` session opens its own
+TCP/TLS connections. The plugin keeps one opened catalog per URL, reused
+by every search until it is ``CATALOG_REFRESH`` seconds old, and one
+keep-alive session whose connection pool is shared by the catalog,
+preview downloads and SAS token requests.
+
+Both are created lazily and guarded by separate locks, so any worker
+thread may call in, and a slow catalog opening never holds up previews or
+token requests. The session is only used for plain requests, whose
+connection pool is thread-safe.
+"""
+import threading
+import time
+
+USER_AGENT = "QuickVRTImageryLoader/0.6"
+
+# Seconds an opened catalog (landing page and conformance) is reused.
+CATALOG_REFRESH = 60 * 60
+
+# Hosts with a connection pool, and kept-alive connections per host.
+POOL_HOSTS = 8
+POOL_SIZE  = 16
+
+_session_lock = threading.Lock()
+_catalog_lock = threading.Lock()
+_session      = None
+_catalogs     = {}
+
+
+def session():
+    """The shared ``requests.Session``."""
+    global _session
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            retries = Retry(total=3, backoff_factor=0.5,
+                            status_forcelist=(429, 500, 502, 503, 504))
+            adapter = HTTPAdapter(
+                pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=retries)
+            shared = requests.Session()
+            shared.mount("https://", adapter)
+            shared.mount("http://", adapter)
+            shared.headers["User-Agent"] = USER_AGENT
+            # Published only once configured: readers skip the lock.
+            _session = shared
+        return _session
+
+
+def catalog(url):
+    """Opened ``pystac_client.Client`` for ``url``, reused until it is
+    ``CATALOG_REFRESH`` seconds old."""
+    shared = session()
+    with _catalog_lock:
+        cached = _catalogs.get(url)
+        if cached is not None and time.monotonic() - cached[1] < CATALOG_REFRESH:
+            return cached[0]
+        # Opened under the lock: concurrent searches wait for one landing
+        # page request instead of each making their own.
+        import pystac_client
+        from pystac_client.stac_api_io import StacApiIO
+        stac_io = StacApiIO()
+        stac_io.session = shared
+        client = pystac_client.Client.open(url, stac_io=stac_io)
+        _catalogs[url] = (client, time.monotonic())
+        return client
+
+
+def forget(url):
+    """Drop the cached catalog of ``url``, e.g. after a failed search."""
+    with _catalog_lock:
+        _catalogs.pop(url, None)
+
+
+def get(url, timeout=10, **kwargs):
+    """GET ``url`` through the shared session; raises on HTTP errors."""
+    response = session().get(url, timeout=timeout, **kwargs)
+    response.raise_for_status()
+    return response
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Shared thread pool for the plugin's background work.
+
+Workers are plain QObjects with a ``run(token)`` method that report back
+through their own signals. The scheduler runs them on one QThreadPool,
+ordered by priority, and hands each a CancellationToken. Submitting work to
+a group cancels whatever was previously submitted to that group, so a new
+thumbnail request simply supersedes the old one instead of killing its
+thread.
+
+Long jobs (exports, composites) run on a second, smaller scheduler, so a
+few of them never hold every thread the searches and previews need.
+"""
+import threading
+
+from qgis.PyQt.QtCore import QRunnable, QThreadPool
+
+PRIORITY_THUMBNAIL = 0
+PRIORITY_SEARCH    = 1
+PRIORITY_LOAD      = 2
+
+# Threads of the scheduler for long jobs.
+JOB_THREADS = 2
+
+
+class TaskCancelled(Exception):
+    """Raised inside a worker to unwind once its token was cancelled."""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class _Runnable(QRunnable):
+    def __init__(self, worker, token, on_finished):
+        super(_Runnable, self).__init__()
+        self.worker      = worker
+        self.token       = token
+        self.on_finished = on_finished
+
+    def run(self):
+        try:
+            if not self.token.cancelled:
+                self.worker.run(self.token)
+        except TaskCancelled:
+            pass
+        finally:
+            self.on_finished(self)
+
+
+class TaskScheduler:
+    """Priority-ordered, cancellable execution of workers on a QThreadPool."""
+
+    def __init__(self, max_threads=4):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self._lock    = threading.Lock()
+        self._running = set()
+        self._groups  = {}
+
+    def submit(self, worker, priority=PRIORITY_THUMBNAIL, group=None):
+        """Queue ``worker.run(token)`` and return its CancellationToken."""
+        token = CancellationToken()
+        runnable = _Runnable(worker, token, self._finished)
+        with self._lock:
+            if group is not None:
+                previous = self._groups.get(group)
+                if previous is not None:
+                    previous.cancel()
+                self._groups[group] = token
+            # Keep the Python wrapper alive until the pool is done with it.
+            self._running.add(runnable)
+        self.pool.start(runnable, priority)
+        return token
+
+    def _finished(self, runnable):
+        with self._lock:
+            self._running.discard(runnable)
+
+    def cancel(self, group):
+        with self._lock:
+            token = self._groups.pop(group, None)
+        if token is not None:
+            token.cancel()
+
+    def cancel_all(self):
+        with self._lock:
+            tokens = [r.token for r in self._running]
+            self._groups.clear()
+        for token in tokens:
+            token.cancel()
+
+    def shutdown(self, timeout_ms=3000):
+        """Cancel everything, drop what has not started and wait up to
+        ``timeout_ms`` for the running workers to unwind."""
+        self.cancel_all()
+        self.pool.clear()
+        self.pool.waitForDone(timeout_ms)
+
+
+_shared = None
+_jobs   = None
+
+
+def shared_scheduler():
+    """The process-wide scheduler for interactive work: searches, previews
+    and layer loads."""
+    global _shared
+    if _shared is None:
+        _shared = TaskScheduler()
+    return _shared
+
+
+def shared_job_scheduler():
+    """The process-wide scheduler for long jobs, ``JOB_THREADS`` at a time."""
+    global _jobs
+    if _jobs is None:
+        _jobs = TaskScheduler(max_threads=JOB_THREADS)
+    return _jobs
+
+
+def shutdown_shared():
+    """Shut the shared schedulers down, if they were ever started."""
+    global _shared, _jobs
+    for scheduler in (_shared, _jobs):
+        if scheduler is not None:
+            scheduler.shutdown()
+    _shared = _jobs = None
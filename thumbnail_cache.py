@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Two-tier cache for the ``rendered_preview`` thumbnails.
+
+Decoded, already scaled images are kept in a bounded in-memory LRU. The
+same images are written as small PNG files to a size-capped directory in the
+QGIS profile, evicting the least recently used files first, so previews
+survive between sessions without any network I/O.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from qgis.PyQt.QtCore import Qt, QBuffer, QByteArray
+from qgis.PyQt.QtGui import QImage
+from qgis.core import QgsApplication
+
+from . import plugin_settings, stac_client
+from .token_manager import shared_token_manager
+
+try:
+    _KeepAspectRatio = Qt.AspectRatioMode.KeepAspectRatio
+    _SmoothTransform = Qt.TransformationMode.SmoothTransformation
+except AttributeError:
+    _KeepAspectRatio = Qt.KeepAspectRatio
+    _SmoothTransform = Qt.SmoothTransformation
+
+try:
+    _WriteOnly = QBuffer.OpenModeFlag.WriteOnly
+except AttributeError:
+    _WriteOnly = QBuffer.WriteOnly
+
+THUMB_SIZE = 240
+
+
+def default_cache_dir():
+    return os.path.join(
+        QgsApplication.qgisSettingsDirPath(), "sentinel_stac_loader", "thumbnails")
+
+
+def download_preview(url, timeout=10):
+    """Fetch a preview image and return it decoded and scaled, or raise."""
+    if not url.lower().startswith(('http://', 'https://')):
+        raise ValueError("Invalid URL")
+    url = shared_token_manager().sign(url)
+    data = stac_client.get(url, timeout=timeout).content
+    image = QImage()
+    if not image.loadFromData(data):
+        raise ValueError("Could not decode image")
+    return image.scaled(THUMB_SIZE, THUMB_SIZE, _KeepAspectRatio, _SmoothTransform)
+
+
+class ThumbnailCache:
+    """Memory LRU of QImages backed by a size-capped PNG directory.
+
+    QImage (unlike QPixmap) may be created off the GUI thread, so the cache
+    can be filled from worker threads; all access goes through one lock.
+    """
+
+    def __init__(self, directory=None, memory_items=None, disk_mb=None):
+        self.directory = directory or default_cache_dir()
+        self.memory_items = memory_items or plugin_settings.value("cache/thumbnail_memory_items")
+        if disk_mb is None:
+            disk_mb = plugin_settings.value("cache/thumbnail_disk_mb")
+        self.disk_bytes = int(disk_mb) * 1024 * 1024
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._disk_used = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def key(item_id, url):
+        return hashlib.sha1(f"{item_id}\n{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".png")
+
+    def _disk_entries(self):
+        """(mtime, path, size) for every cached file."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".png"):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.path, st.st_size))
+        return entries
+
+    def get_memory(self, item_id, url):
+        """Memory tier only; cheap enough to call on the GUI thread."""
+        key = self.key(item_id, url)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+            return image
+
+    def get(self, item_id, url):
+        """Look up memory, then disk (promoting hits to memory)."""
+        image = self.get_memory(item_id, url)
+        if image is not None:
+            return image
+        key = self.key(item_id, url)
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        image = QImage(path)
+        if image.isNull():
+            return None
+        try:
+            # Touch the file so eviction follows last use, not creation.
+            os.utime(path, None)
+        except OSError:
+            pass
+        self._remember(key, image)
+        return image
+
+    def put(self, item_id, url, image):
+        key = self.key(item_id, url)
+        self._remember(key, image)
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        data = QByteArray()
+        buf = QBuffer(data)
+        buf.open(_WriteOnly)
+        image.save(buf, "PNG")
+        buf.close()
+        try:
+            with open(path, "wb") as fh:
+                fh.write(bytes(data))
+        except OSError:
+            return
+        with self._lock:
+            self._disk_used += len(data)
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key, image):
+        with self._lock:
+            self._memory[key] = image
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop least recently used files until under 90% of the cap."""
+        entries = sorted(self._disk_entries())
+        used = sum(size for _, _, size in entries)
+        target = int(self.disk_bytes * 0.9)
+        for _, path, size in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+        self._disk_used = used
+
+
+class ThumbnailPrefetcher:
+    """Warms a ThumbnailCache in the background with a small worker pool.
+
+    ``cancel()`` drops everything still queued; downloads already in flight
+    finish and land in the cache, but nothing new is started for them.
+    """
+
+    def __init__(self, cache, max_workers=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or plugin_settings.value("prefetch/workers"),
+            thread_name_prefix="thumb-prefetch")
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def prefetch(self, requests):
+        """Queue ``(item_id, url)`` pairs that are not cached or queued yet."""
+        for item_id, url in requests:
+            key = ThumbnailCache.key(item_id, url)
+            with self._lock:
+                if key in self._pending:
+                    continue
+                if self.cache.get_memory(item_id, url) is not None:
+                    continue
+                future = self._pool.submit(self._fetch, item_id, url)
+                self._pending[key] = future
+            future.add_done_callback(lambda f, key=key: self._forget(key, f))
+
+    def _fetch(self, item_id, url):
+        if self.cache.get(item_id, url) is None:
+            self.cache.put(item_id, url, download_preview(url))
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def cancel(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.cancel()
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.shutdown(wait=False)
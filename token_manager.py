@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Expiry-aware cache of Planetary Computer SAS tokens.
+
+Planetary Computer hands out one read token per storage account/container,
+valid for a long window. Instead of calling ``planetary_computer.sign`` for
+every asset href, the manager fetches one token per container, keeps it
+until shortly before it expires and appends it to hrefs locally. Tokens
+that enter the refresh margin are renewed on a background thread while the
+still-valid token keeps being served. Tokens are requested through the
+plugin's pooled HTTP session (see stac_client.py).
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+BLOB_SUFFIX = ".blob.core.windows.net"
+SAS_URL     = "https://planetarycomputer.microsoft.com/api/sas/v1/token"
+
+
+def _expiry_timestamp(value):
+    """Accept a datetime or an ISO-8601 string and return a POSIX timestamp."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def split_blob_href(href):
+    """Return ``(account, container)`` for an Azure blob href, else None."""
+    parsed = urlparse(href)
+    host = parsed.netloc
+    if parsed.scheme != "https" or not host.endswith(BLOB_SUFFIX):
+        return None
+    path = parsed.path.lstrip("/")
+    if not path:
+        return None
+    return host[: -len(BLOB_SUFFIX)], path.split("/", 1)[0]
+
+
+class SasTokenManager:
+    """Thread-safe per-container token store used by every signing path."""
+
+    def __init__(self, refresh_margin=15 * 60):
+        self.refresh_margin = refresh_margin
+        self._lock       = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._tokens     = {}
+        self._refreshing = set()
+
+    def _fetch(self, account, container):
+        from planetary_computer.settings import Settings
+        from .stac_client import get
+        settings = Settings.get()
+        headers = {}
+        if settings.subscription_key:
+            headers["Ocp-Apim-Subscription-Key"] = settings.subscription_key
+        base = getattr(settings, "sas_url", None) or SAS_URL
+        data = get(f"{base.rstrip('/')}/{account}/{container}", headers=headers).json()
+        return data["token"], _expiry_timestamp(data["msft:expiry"])
+
+    def _cached(self, key):
+        """Token still usable right now, scheduling a refresh when it is close
+        to expiry; None when a blocking fetch is needed."""
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(key)
+        if cached is None:
+            return None
+        token, expiry = cached
+        if now < expiry - self.refresh_margin:
+            return token
+        if now < expiry - 60:
+            self._refresh_async(key)
+            return token
+        return None
+
+    def token(self, account, container):
+        key = (account, container)
+        token = self._cached(key)
+        if token is not None:
+            return token
+        # One blocking fetch at a time, so parallel loads share its result.
+        with self._fetch_lock:
+            token = self._cached(key)
+            if token is not None:
+                return token
+            token, expiry = self._fetch(account, container)
+            with self._lock:
+                self._tokens[key] = (token, expiry)
+        return token
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                fresh = self._fetch(*key)
+                with self._lock:
+                    self._tokens[key] = fresh
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="sas-refresh", daemon=True).start()
+
+    def sign(self, href):
+        """Append the container's token to a blob href; other URLs pass through."""
+        parts = split_blob_href(href)
+        if parts is None or "sig=" in href:
+            return href
+        token = self.token(*parts)
+        return f"{href}{'&' if '?' in href else '?'}{token}"
+
+    def sign_item(self, item):
+        """Sign every asset of a pystac Item in place and return it."""
+        for asset in item.assets.values():
+            asset.href = self.sign(asset.href)
+        return item
+
+
+_shared = None
+
+
+def shared_token_manager():
+    global _shared
+    if _shared is None:
+        _shared = SasTokenManager()
+    return _shared
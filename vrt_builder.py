@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Builds band-stack VRTs for STAC items without touching the remote COGs.
+
+STAC items from Planetary Computer carry the projection extension
+(``proj:shape``, ``proj:transform``, ``proj:epsg``/``proj:code``) and, for
+some collections, ``raster:bands``. That is everything a VRT needs, so the
+XML can be written directly instead of letting GDAL open every band to read
+its header. When the metadata is incomplete the stack is built with
+``gdal.BuildVRT`` as before.
+
+A VRT can also be written on a coarser grid than the bands themselves.
+GDAL then serves reads from the COG overview that matches, so a zoomed-out
+view fetches a few small overview blocks instead of full-resolution tiles.
+
+With a ``CloudMask`` the VRT also gets a mask band computed from the
+item's classification band, see cloud_mask.py.
+"""
+import atexit
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import textwrap
+import threading
+from collections import Counter, namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+from . import cloud_mask, indices
+
+GDAL_TYPES = {
+    "uint8": "Byte", "int8": "Int8",
+    "uint16": "UInt16", "int16": "Int16",
+    "uint32": "UInt32", "int32": "Int32",
+    "float32": "Float32", "float64": "Float64",
+}
+
+# Used when an asset has no raster:bands entry.
+DEFAULT_BAND_INFO = {
+    "sentinel-2-l2a": {"*": ("UInt16", 0), "SCL": ("Byte", 0)},
+    "landsat-c2-l2":  {"*": ("UInt16", 0), "qa_pixel": ("UInt16", 1)},
+}
+
+BandSource = namedtuple(
+    "BandSource", "key href width height geotransform epsg data_type nodata")
+
+
+class MissingMetadata(Exception):
+    """The item lacks the projection metadata needed for a direct VRT."""
+
+
+_vrt_dir_lock = threading.Lock()
+_vrt_dir      = None
+
+
+def vrt_dir():
+    """Private (0700) directory of this QGIS session, removed at exit.
+
+    The VRTs hold SAS-signed URLs, so they must not land in a shared,
+    predictable location where other users could read or pre-create them,
+    nor be overwritten by another QGIS session building the same names.
+    """
+    global _vrt_dir
+    with _vrt_dir_lock:
+        if _vrt_dir is None:
+            _vrt_dir = tempfile.mkdtemp(prefix="sentinel_stac_loader_")
+            atexit.register(shutil.rmtree, _vrt_dir, True)
+        return _vrt_dir
+
+
+def epsg_from_fields(fields):
+    """EPSG code from ``proj:epsg`` or an ``EPSG:`` ``proj:code``, else None."""
+    if fields.get("proj:epsg"):
+        return int(fields["proj:epsg"])
+    code = fields.get("proj:code") or ""
+    if code.upper().startswith("EPSG:"):
+        return int(code.split(":", 1)[1])
+    return None
+
+
+def majority_epsg(items):
+    """EPSG code shared by most of ``items``, or None when none has one."""
+    counts = Counter(epsg_from_fields(item.properties) for item in items)
+    counts.pop(None, None)
+    return max(counts, key=counts.get, default=None)
+
+
+def bounds_in(target, bbox):
+    """Transform a lon/lat bbox to ``target`` (min_x, min_y, max_x, max_y).
+
+    ``target`` is an EPSG code or an ``osr.SpatialReference``.
+    """
+    from osgeo import osr
+    src = osr.SpatialReference()
+    src.ImportFromEPSG(4326)
+    if isinstance(target, int):
+        dst = osr.SpatialReference()
+        dst.ImportFromEPSG(target)
+    else:
+        dst = target.Clone()
+    for srs in (src, dst):
+        if hasattr(srs, "SetAxisMappingStrategy"):
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    ct = osr.CoordinateTransformation(src, dst)
+    xs, ys = [], []
+    for x in (bbox[0], bbox[2]):
+        for y in (bbox[1], bbox[3]):
+            px, py, _ = ct.TransformPoint(x, y)
+            xs.append(px)
+            ys.append(py)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def view_resolution(epsg, bbox, width_px):
+    """Ground size of one screen pixel, in ``epsg`` units, for a lon/lat
+    ``bbox`` drawn ``width_px`` pixels wide."""
+    min_x, _, max_x, _ = bounds_in(epsg, bbox)
+    return (max_x - min_x) / max(1, width_px)
+
+
+def overview_resolution(native, target=None, overview=None):
+    """Pixel size to build a VRT at, or None for full resolution.
+
+    ``overview`` pins a level (1 = half resolution, 2 = quarter, ...).
+    Otherwise ``target`` is snapped down to a power-of-two multiple of the
+    native pixel size, which is where COG overviews sit, so GDAL reads one
+    overview as is rather than resampling a finer one.
+    """
+    if overview:
+        factor = 2 ** int(overview)
+    elif target and target > native:
+        factor = 2 ** int(math.floor(math.log2(target / native)))
+    else:
+        return None
+    return native * factor if factor > 1 else None
+
+
+def band_source(item, key, href, collection):
+    """Describe one asset as a BandSource from its STAC metadata."""
+    asset = item.assets[key]
+    fields = dict(item.properties)
+    fields.update(asset.extra_fields)
+
+    shape = fields.get("proj:shape")
+    transform = fields.get("proj:transform")
+    epsg = epsg_from_fields(fields)
+    if not shape or not transform or epsg is None:
+        raise MissingMetadata(key)
+    a, b, c, d, e, f = transform[:6]
+    if b or d:
+        raise MissingMetadata(f"{key}: rotated grid")
+
+    defaults = DEFAULT_BAND_INFO.get(collection, {})
+    data_type, nodata = defaults.get(key, defaults.get("*", (None, None)))
+    raster_bands = fields.get("raster:bands") or []
+    if raster_bands:
+        data_type = GDAL_TYPES.get(raster_bands[0].get("data_type"), data_type)
+        nodata = raster_bands[0].get("nodata", nodata)
+    if data_type is None:
+        raise MissingMetadata(f"{key}: unknown data type")
+
+    return BandSource(
+        key, href, int(shape[1]), int(shape[0]), (c, a, b, f, d, e), epsg, data_type, nodata)
+
+
+def stack_grid(sources, resolution=None):
+    """Union extent of the sources on the finest (or the given) pixel size.
+
+    Returns ``(geotransform, width, height)``.
+    """
+    min_x = min(s.geotransform[0] for s in sources)
+    max_y = max(s.geotransform[3] for s in sources)
+    max_x = max(s.geotransform[0] + s.geotransform[1] * s.width for s in sources)
+    min_y = min(s.geotransform[3] + s.geotransform[5] * s.height for s in sources)
+    if resolution is None:
+        res_x = min(s.geotransform[1] for s in sources)
+        res_y = min(abs(s.geotransform[5]) for s in sources)
+    else:
+        res_x = res_y = resolution
+    width = max(1, int(round((max_x - min_x) / res_x)))
+    height = max(1, int(round((max_y - min_y) / res_y)))
+    return (min_x, res_x, 0.0, max_y, 0.0, -res_y), width, height
+
+
+def _source_xml(source, gt):
+    src_gt = source.geotransform
+    x_off = (src_gt[0] - gt[0]) / gt[1]
+    y_off = (gt[3] - src_gt[3]) / -gt[5]
+    x_size = source.width * src_gt[1] / gt[1]
+    y_size = source.height * abs(src_gt[5]) / -gt[5]
+    return (
+        '    <SimpleSource>\n'
+        f'      <SourceFilename relativeToVRT="0">{escape(source.href)}</SourceFilename>\n'
+        '      <SourceBand>1</SourceBand>\n'
+        f'      <SourceProperties RasterXSize="{source.width}" RasterYSize="{source.height}"'
+        f' DataType="{source.data_type}"/>\n'
+        f'      <SrcRect xOff="0" yOff="0" xSize="{source.width}" ySize="{source.height}"/>\n'
+        f'      <DstRect xOff="{x_off:.10g}" yOff="{y_off:.10g}"'
+        f' xSize="{x_size:.10g}" ySize="{y_size:.10g}"/>\n'
+        '    </SimpleSource>\n'
+    )
+
+
+def mask_band_xml(source, mask, gt):
+    """Dataset ``<MaskBand>`` computing the ``CloudMask`` ``mask`` from ``source``."""
+    values = ",".join(str(v) for v in mask.values)
+    return (
+        '  <MaskBand>\n'
+        '    <VRTRasterBand dataType="Byte" subClass="VRTDerivedRasterBand">\n'
+        f'      <PixelFunctionType>{cloud_mask.pixel_function_name(mask.function)}</PixelFunctionType>\n'
+        '      <PixelFunctionLanguage>Python</PixelFunctionLanguage>\n'
+        f'      <PixelFunctionArguments values={quoteattr(values)}/>\n'
+        f'      <SourceTransferType>{source.data_type}</SourceTransferType>\n'
+        + textwrap.indent(_source_xml(source, gt), '  ') +
+        '    </VRTRasterBand>\n'
+        '  </MaskBand>\n'
+    )
+
+
+def _check_crs(sources, mask_source):
+    if len({s.epsg for s in sources + ([mask_source] if mask_source else [])}) != 1:
+        raise MissingMetadata("bands use different CRSs")
+
+
+def stack_vrt_xml(sources, resolution=None, mask=None, mask_source=None):
+    """VRT XML with one band per source, as BuildVRT -separate would write,
+    plus a mask band when ``mask`` and its ``mask_source`` are given."""
+    _check_crs(sources, mask_source)
+    gt, width, height = stack_grid(sources, resolution)
+    parts = [
+        f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">\n',
+        f'  <SRS dataAxisToSRSAxisMapping="1,2">EPSG:{sources[0].epsg}</SRS>\n',
+        '  <GeoTransform>{}</GeoTransform>\n'.format(", ".join(f"{v:.17g}" for v in gt)),
+    ]
+    for idx, source in enumerate(sources, start=1):
+        parts.append(f'  <VRTRasterBand dataType="{source.data_type}" band="{idx}">\n')
+        parts.append(f'    <Description>{escape(source.key)}</Description>\n')
+        if source.nodata is not None:
+            parts.append(f'    <NoDataValue>{source.nodata}</NoDataValue>\n')
+        parts.append(_source_xml(source, gt))
+        parts.append('  </VRTRasterBand>\n')
+    if mask_source is not None:
+        parts.append(mask_band_xml(mask_source, mask, gt))
+    parts.append('</VRTDataset>\n')
+    return "".join(parts)
+
+
+def index_vrt_xml(sources, index, scaling, resolution=None, mask=None, mask_source=None):
+    """VRT XML with one derived Float32 band computing ``index`` from the
+    sources; ``scaling`` holds each source's ``(scale, offset)``."""
+    _check_crs(sources, mask_source)
+    gt, width, height = stack_grid(sources, resolution)
+    arguments = {
+        "scales":     ",".join(f"{scale:.10g}" for scale, _ in scaling),
+        "offsets":    ",".join(f"{offset:.10g}" for _, offset in scaling),
+        "src_nodata": f"{sources[0].nodata if sources[0].nodata is not None else 0:g}",
+    }
+    parts = [
+        f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">\n',
+        f'  <SRS dataAxisToSRSAxisMapping="1,2">EPSG:{sources[0].epsg}</SRS>\n',
+        '  <GeoTransform>{}</GeoTransform>\n'.format(", ".join(f"{v:.17g}" for v in gt)),
+        '  <VRTRasterBand dataType="Float32" band="1" subClass="VRTDerivedRasterBand">\n',
+        f'    <Description>{escape(index.name)}</Description>\n',
+        f'    <NoDataValue>{indices.INDEX_NODATA:g}</NoDataValue>\n',
+        f'    <PixelFunctionType>{indices.pixel_function_name(index.function)}</PixelFunctionType>\n',
+        '    <PixelFunctionLanguage>Python</PixelFunctionLanguage>\n',
+        '    <PixelFunctionArguments {}/>\n'.format(
+            " ".join(f"{k}={quoteattr(v)}" for k, v in arguments.items())),
+        '    <SourceTransferType>Float32</SourceTransferType>\n',
+    ]
+    parts.extend(_source_xml(source, gt) for source in sources)
+    parts.append('  </VRTRasterBand>\n')
+    if mask_source is not None:
+        parts.append(mask_band_xml(mask_source, mask, gt))
+    parts.append('</VRTDataset>\n')
+    return "".join(parts)
+
+
+def vrt_path(name, *parts):
+    """Stable temp path for a VRT identified by ``name`` and extra parts."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(vrt_dir(), f"{name}_{digest}.vrt")
+
+
+def write_vrt(xml, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(xml)
+    return path
+
+
+def gdal_build_vrt(hrefs, path, separate=True, **options):
+    """Fallback that lets GDAL open the sources and write the VRT."""
+    from osgeo import gdal
+    ds = gdal.BuildVRT(path, hrefs, separate=separate, **options)
+    if ds is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or "BuildVRT failed")
+    ds = None
+    return path
+
+
+def composition_nodata(bands):
+    """Nodata value of the VRTs built for a composition."""
+    return indices.INDEX_NODATA if isinstance(bands, indices.SpectralIndex) else 0
+
+
+def mask_band_source(item, mask, collection, sign):
+    """``BandSource`` of the classification band a ``CloudMask`` reads."""
+    if mask.key not in item.assets:
+        raise ValueError(f"{item.id} has no {mask.key} band to mask clouds with")
+    href = f"/vsicurl/{sign(item.assets[mask.key].href)}"
+    try:
+        source = band_source(item, mask.key, href, collection)
+    except MissingMetadata:
+        raise ValueError(f"{item.id} lacks the projection metadata needed for cloud masking")
+    cloud_mask.enable()
+    return source
+
+
+def build_index_vrt(item, index, collection, sign, resolution=None, overview=None, mask=None):
+    """Write a single-band VRT computing a ``SpectralIndex`` for ``item``."""
+    missing = [k for k in index.bands if k not in item.assets]
+    if missing:
+        raise ValueError(f"{index.name} needs the bands {', '.join(missing)}")
+    hrefs = [f"/vsicurl/{sign(item.assets[k].href)}" for k in index.bands]
+    try:
+        sources = [band_source(item, k, h, collection) for k, h in zip(index.bands, hrefs)]
+    except MissingMetadata:
+        raise ValueError(f"{item.id} lacks the projection metadata needed for {index.name}")
+    mask_source = mask_band_source(item, mask, collection, sign) if mask else None
+    scaling = [indices.reflectance_scaling(item, k, collection) for k in index.bands]
+    native = min(s.geotransform[1] for s in sources)
+    res = overview_resolution(native, resolution, overview)
+    indices.enable()
+    path = vrt_path(f"{item.id}_{index.name}", *index.bands, *([res] if res else []),
+                    *([mask] if mask else []))
+    return write_vrt(index_vrt_xml(sources, index, scaling, res, mask, mask_source), path)
+
+
+def build_item_vrt(item, bands, collection, sign, resolution=None, overview=None, mask=None):
+    """Write a band-stack VRT for ``item`` and return its path.
+
+    ``sign`` turns an asset href into a readable (signed) URL. ``resolution``
+    (target pixel size in the item's CRS) or ``overview`` (a pinned overview
+    level) build the stack on a coarser grid; see ``overview_resolution``.
+    ``bands`` may also be a ``SpectralIndex``, see ``build_index_vrt``.
+    ``mask`` (a ``CloudMask``) adds a cloud mask band; it needs the
+    projection metadata.
+    """
+    if isinstance(bands, indices.SpectralIndex):
+        return build_index_vrt(item, bands, collection, sign, resolution, overview, mask)
+    keys = [b for b in bands if b in item.assets]
+    if not keys:
+        raise ValueError("No valid band assets found")
+    hrefs = [f"/vsicurl/{sign(item.assets[k].href)}" for k in keys]
+    mask_source = mask_band_source(item, mask, collection, sign) if mask else None
+    try:
+        sources = [band_source(item, k, h, collection) for k, h in zip(keys, hrefs)]
+        native = min(s.geotransform[1] for s in sources)
+        res = overview_resolution(native, resolution, overview)
+        path = vrt_path(item.id, *keys, *([res] if res else []), *([mask] if mask else []))
+        return write_vrt(stack_vrt_xml(sources, res, mask, mask_source), path)
+    except MissingMetadata:
+        if mask:
+            raise ValueError(f"{item.id} lacks the projection metadata needed for cloud masking")
+        # Without the metadata GDAL reads the native pixel size from the
+        # bands; the reduced grid is only used when it is coarser, as above.
+        path = gdal_build_vrt(hrefs, vrt_path(item.id, *keys), resolution="highest")
+        if not (resolution or overview):
+            return path
+        from osgeo import gdal
+        ds = gdal.Open(path)
+        native = abs(ds.GetGeoTransform()[1])
+        ds = None
+        res = overview_resolution(native, resolution, overview)
+        if res is None:
+            return path
+        return gdal_build_vrt(
+            hrefs, vrt_path(item.id, *keys, res), resolution="user", xRes=res, yRes=res)